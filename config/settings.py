@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.sites",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "mailing",
     "messaging",
     "recipients",
@@ -162,6 +163,51 @@ EMAIL_USE_SSL = True
 SERVER_EMAIL = EMAIL_HOST_USER
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Сколько писем отправляется через одно SMTP-соединение до переподключения
+MAILING_SMTP_BATCH_SIZE = int(os.getenv("MAILING_SMTP_BATCH_SIZE", 100))
+
+# Ограничение скорости отправки, общее для всех обработчиков (состояние в Redis).
+# Выключено, пока не задан RATE - писем в секунду. BURST - сколько писем можно
+# отправить разом, MIN_RATE - нижняя граница при ответах 4xx, RECOVERY_STEP -
+# прибавка к скорости после каждого успешного письма, DAILY_LIMIT - писем
+# в сутки (0 - без ограничения, действует только при включенном RATE).
+# Если Redis недоступен, письма отправляются без ограничения
+MAILING_RATE_LIMIT = {
+    "REDIS_URL": os.getenv("MAILING_RATE_LIMIT_REDIS_URL", "redis://127.0.0.1:6379/1"),
+    "RATE": float(os.getenv("MAILING_RATE_LIMIT", 0)),
+    "BURST": int(os.getenv("MAILING_RATE_LIMIT_BURST", 10)),
+    "MIN_RATE": float(os.getenv("MAILING_RATE_LIMIT_MIN", 0.2)),
+    "RECOVERY_STEP": float(os.getenv("MAILING_RATE_LIMIT_RECOVERY_STEP", 0.05)),
+    "DAILY_LIMIT": int(os.getenv("MAILING_DAILY_LIMIT", 0)),
+}
+
+# Повторная отправка при временных ошибках (4xx, обрыв соединения):
+# не больше MAX_ATTEMPTS попыток, задержка растет от BASE_DELAY до MAX_DELAY сек.
+MAILING_RETRY = {
+    "MAX_ATTEMPTS": int(os.getenv("MAILING_RETRY_MAX_ATTEMPTS", 5)),
+    "BASE_DELAY": int(os.getenv("MAILING_RETRY_BASE_DELAY", 60)),
+    "MAX_DELAY": int(os.getenv("MAILING_RETRY_MAX_DELAY", 3600)),
+}
+
+# Задание в статусе "выполняется", обработчик которого не отмечался дольше
+# стольких секунд, считается прерванным (процесс убит) и возвращается в очередь
+MAILING_JOB_STALE_TIMEOUT = int(os.getenv("MAILING_JOB_STALE_TIMEOUT", 600))
+
+# Размер пачки при потоковом чтении получателей рассылки
+MAILING_CHUNK_SIZE = int(os.getenv("MAILING_CHUNK_SIZE", 1000))
+
+# Буфер попыток отправки: запись в БД пачкой по размеру или по времени (сек.)
+MAILING_ATTEMPT_BUFFER_SIZE = int(os.getenv("MAILING_ATTEMPT_BUFFER_SIZE", 500))
+MAILING_ATTEMPT_FLUSH_INTERVAL = float(os.getenv("MAILING_ATTEMPT_FLUSH_INTERVAL", 5))
+
+# Сколько секунд хранить статистику рассылок в кэше (сбрасывается при изменениях)
+MAILING_DASHBOARD_CACHE_TIMEOUT = int(
+    os.getenv("MAILING_DASHBOARD_CACHE_TIMEOUT", 24 * 60 * 60)
+)
+
+# Попытки отправки старше стольких суток переносятся в архив (archive_attempts)
+MAILING_ATTEMPT_RETENTION_DAYS = int(os.getenv("MAILING_ATTEMPT_RETENTION_DAYS", 90))
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CACHES = {
@@ -0,0 +1,33 @@
+from django.contrib import admin
+
+from mailing.forms import MailingForm
+from mailing.models import Mailing
+from mailing.services import add_mailing_recipients, clear_mailing_recipients
+from recipients.models import Recipient
+
+
+@admin.register(Mailing)
+class MailingAdmin(admin.ModelAdmin):
+    # MailingForm сохраняет получателей пачками, а raw_id_fields не выводит
+    # всех клиентов в списке выбора
+    form = MailingForm
+    list_display = ("id", "owner", "message", "status", "start_time", "end_time")
+    list_filter = ("status",)
+    list_select_related = ("owner", "message")
+    raw_id_fields = ("owner", "message", "recipients", "segment")
+    actions = ["add_owner_recipients", "clear_recipients"]
+
+    @admin.action(description="Добавить в получатели всех клиентов владельца")
+    def add_owner_recipients(self, request, queryset):
+        added = sum(
+            add_mailing_recipients(
+                mailing, Recipient.objects.filter(owner_id=mailing.owner_id)
+            )
+            for mailing in queryset
+        )
+        self.message_user(request, f"Добавлено получателей: {added}")
+
+    @admin.action(description="Убрать всех получателей")
+    def clear_recipients(self, request, queryset):
+        removed = sum(clear_mailing_recipients(mailing) for mailing in queryset)
+        self.message_user(request, f"Убрано получателей: {removed}")
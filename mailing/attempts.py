@@ -0,0 +1,218 @@
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from mailing.dashboard import invalidate_dashboard
+from mailing.delivery import is_transient
+from mailing.models import (MailingAttempt, MailingAttemptRollup,
+                            MailingDelivery, MailingStats)
+
+
+def retry_delay(attempt_count):
+    """
+    Задержка перед повтором в секундах: экспоненциальный рост от BASE_DELAY
+    до MAX_DELAY и случайный разброс в пределах второй половины интервала,
+    чтобы повторы после массового сбоя не уходили одновременно
+    """
+    config = settings.MAILING_RETRY
+    delay = min(config["MAX_DELAY"], config["BASE_DELAY"] * 2 ** (attempt_count - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def schedule_retry(delivery, error, now):
+    """Переводит доставку после ошибки в очередь повторов или в failed"""
+    delivery.attempt_count += 1
+    if (
+        error is not None
+        and is_transient(error)
+        and delivery.attempt_count < settings.MAILING_RETRY["MAX_ATTEMPTS"]
+    ):
+        delivery.status = "retry"
+        delivery.next_attempt_at = now + timedelta(
+            seconds=retry_delay(delivery.attempt_count)
+        )
+    else:
+        delivery.status = "failed"
+        delivery.next_attempt_at = None
+    delivery.updated_at = now
+
+
+def update_mailing_stats(attempts):
+    """
+    Добавляет попытки к счетчикам их рассылок (MailingStats). Счетчики
+    увеличиваются через F-выражения одним UPDATE на рассылку, поэтому
+    одновременная запись из нескольких обработчиков ничего не теряет.
+    Вызывается в транзакции, в которой записываются сами попытки
+    """
+    counters = {}
+    for attempt in attempts:
+        total, success, last = counters.get(attempt.mailing_id, (0, 0, None))
+        counters[attempt.mailing_id] = (
+            total + 1,
+            success + (attempt.status == "success"),
+            max(last, attempt.datetime_attempt) if last else attempt.datetime_attempt,
+        )
+
+    # Строки блокируются по возрастанию mailing_id: параллельные записи
+    # буферов разных обработчиков не захватывают их встречно (deadlock)
+    counters = dict(sorted(counters.items()))
+    MailingStats.objects.bulk_create(
+        [MailingStats(mailing_id=mailing_id) for mailing_id in counters],
+        ignore_conflicts=True,
+    )
+    for mailing_id, (total, success, last) in counters.items():
+        MailingStats.objects.filter(mailing_id=mailing_id).update(
+            total=F("total") + total,
+            success=F("success") + success,
+            failed=F("failed") + (total - success),
+            last_attempt_at=Greatest(
+                Coalesce("last_attempt_at", Value(last)), Value(last)
+            ),
+        )
+
+
+def rollup_bucket(moment, period):
+    """Начало часа или суток (в часовом поясе проекта), в которые попадает moment"""
+    moment = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    if period == "day":
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def update_attempt_rollups(attempts):
+    """
+    Добавляет попытки к почасовым и посуточным счетчикам (MailingAttemptRollup)
+    так же, как update_mailing_stats(): недостающие строки создаются, затем
+    счетчики увеличиваются через F-выражения
+    """
+    counters = {}
+    for attempt in attempts:
+        for period, _ in MailingAttemptRollup.PERIOD_CHOICES:
+            key = (
+                attempt.mailing_id,
+                period,
+                rollup_bucket(attempt.datetime_attempt, period),
+                attempt.status,
+            )
+            counters[key] = counters.get(key, 0) + 1
+
+    # Постоянный порядок блокировки строк, как в update_mailing_stats()
+    counters = dict(sorted(counters.items()))
+    MailingAttemptRollup.objects.bulk_create(
+        [
+            MailingAttemptRollup(
+                mailing_id=mailing_id, period=period, bucket=bucket, status=status
+            )
+            for mailing_id, period, bucket, status in counters
+        ],
+        ignore_conflicts=True,
+    )
+    for (mailing_id, period, bucket, status), count in counters.items():
+        MailingAttemptRollup.objects.filter(
+            mailing_id=mailing_id, period=period, bucket=bucket, status=status
+        ).update(count=F("count") + count)
+
+
+class AttemptWriter:
+    """
+    Буферизованная запись попыток отправки.
+
+    Попытки копятся в памяти и записываются одним bulk_create, когда в буфере
+    набирается size записей или с последней записи прошло interval секунд.
+    При выходе из контекста буфер записывается всегда, в том числе при
+    исключении и KeyboardInterrupt.
+
+    Вместе с попытками в той же транзакции обновляются счетчики рассылки
+    (MailingStats, MailingAttemptRollup) и состояние доставок (outbox) -
+    контрольная точка для продолжения отправки. После фиксации сбрасывается
+    кэш статистики.
+    Доставки с временной ошибкой уходят в очередь повторов (retry) с
+    экспоненциальной задержкой, с постоянной - в failed.
+
+    Если процесс убит без возможности выполнить код (SIGKILL, SIGTERM без
+    обработчика, падение сервера), теряется не больше size попыток, накопленных
+    не дольше interval секунд. Письма по этим попыткам уже отправлены, но
+    доставки остаются в статусе pending, поэтому при следующем запуске эти
+    получатели (не больше size) получат письмо повторно.
+    """
+
+    def __init__(self, size=None, interval=None):
+        self.size = size or settings.MAILING_ATTEMPT_BUFFER_SIZE
+        self.interval = interval or settings.MAILING_ATTEMPT_FLUSH_INTERVAL
+        self.buffer = []
+        self.sent = []
+        self.failed = []
+        self.last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def add(
+        self,
+        mailing,
+        status,
+        mail_server_response,
+        datetime_attempt=None,
+        delivery=None,
+        error=None,
+    ):
+        """
+        Добавляет попытку в буфер. error - исключение неудачной отправки,
+        по нему решается, повторять ли отправку получателю
+        """
+        now = timezone.now()
+        if delivery is not None:
+            if status == "success":
+                self.sent.append(delivery.pk)
+            else:
+                schedule_retry(delivery, error, now)
+                self.failed.append(delivery)
+        self.buffer.append(
+            MailingAttempt(
+                datetime_attempt=datetime_attempt or now,
+                status=status,
+                mail_server_response=mail_server_response,
+                mailing=mailing,
+            )
+        )
+        if (
+            len(self.buffer) >= self.size
+            or time.monotonic() - self.last_flush >= self.interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные попытки и состояние доставок"""
+        if self.buffer:
+            with transaction.atomic():
+                MailingAttempt.objects.bulk_create(self.buffer)
+                update_mailing_stats(self.buffer)
+                update_attempt_rollups(self.buffer)
+                invalidate_dashboard(
+                    {attempt.mailing.owner_id for attempt in self.buffer}
+                )
+                if self.sent:
+                    MailingDelivery.objects.filter(pk__in=self.sent).update(
+                        status="sent",
+                        attempt_count=F("attempt_count") + 1,
+                        next_attempt_at=None,
+                        updated_at=timezone.now(),
+                    )
+                if self.failed:
+                    MailingDelivery.objects.bulk_update(
+                        self.failed,
+                        ["status", "attempt_count", "next_attempt_at", "updated_at"],
+                    )
+            self.buffer = []
+            self.sent = []
+            self.failed = []
+        self.last_flush = time.monotonic()
@@ -0,0 +1,116 @@
+"""
+Кэш страницы статистики рассылок.
+
+Статистика хранится в кэше (Redis) отдельно для каждого владельца и для
+менеджеров (все рассылки) под ключом с номером версии. Любая запись
+рассылок, клиентов или попыток отправки владельца меняет версию его
+статистики и статистики менеджеров, поэтому устаревшие данные больше не
+читаются и истекают сами. Версия меняется после фиксации транзакции, чтобы
+статистика не была посчитана заново по еще не зафиксированным данным.
+
+Пока один запрос считает статистику, остальные ждут результат, а не
+считают ее одновременно.
+
+Если Redis недоступен, статистика считается без кэша, а запись рассылок
+и отправка продолжаются: сбой только пишется в лог.
+"""
+
+import logging
+import time
+import uuid
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "mailing:dashboard"
+
+# Статистика всех рассылок для менеджеров
+ALL_OWNERS = "all"
+
+# Сколько секунд ждать статистику, которую считает другой запрос
+LOCK_TIMEOUT = 30
+LOCK_POLL_INTERVAL = 0.1
+
+
+def version_key(scope):
+    return f"{KEY_PREFIX}:version:{scope}"
+
+
+def get_version(scope):
+    version = cache.get(version_key(scope))
+    if version is None:
+        version = uuid.uuid4().hex
+        # add() не перезапишет версию, установленную другим запросом
+        if not cache.add(version_key(scope), version, None):
+            version = cache.get(version_key(scope), version)
+    return version
+
+
+def invalidate_dashboard(owner_ids):
+    """
+    Сбрасывает статистику владельцев и менеджеров. Внутри транзакции
+    сброс выполняется после ее фиксации
+    """
+    scopes = {ALL_OWNERS, *owner_ids}
+
+    def bump():
+        try:
+            cache.set_many(
+                {version_key(scope): uuid.uuid4().hex for scope in scopes}, None
+            )
+        except redis.RedisError as e:
+            # Устаревшая статистика истечет через MAILING_DASHBOARD_CACHE_TIMEOUT
+            logger.warning(f"Не удалось сбросить кэш статистики: {e}")
+
+    transaction.on_commit(bump)
+
+
+def get_dashboard(scope, compute):
+    """
+    Статистика из кэша или compute(), если ее там нет или Redis недоступен.
+    scope - id владельца или ALL_OWNERS
+    """
+    try:
+        key = f"{KEY_PREFIX}:{scope}:{get_version(scope)}"
+        data = cache.get(key)
+        if data is None:
+            data = wait_for_dashboard(key)
+    except redis.RedisError as e:
+        logger.warning(f"Кэш статистики недоступен, статистика считается без него: {e}")
+        return compute()
+    if data is not None:
+        return data
+
+    try:
+        data = compute()
+        cache.set(key, data, settings.MAILING_DASHBOARD_CACHE_TIMEOUT)
+    except redis.RedisError as e:
+        logger.warning(f"Не удалось сохранить статистику в кэш: {e}")
+    finally:
+        try:
+            cache.delete(f"{key}:lock")
+        except redis.RedisError:
+            pass
+    return data
+
+
+def wait_for_dashboard(key):
+    """
+    Берет блокировку расчета статистики key. Если статистику тем временем
+    посчитал другой запрос, возвращает ее, иначе None - считать нужно самому
+    """
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        time.sleep(LOCK_POLL_INTERVAL)
+        data = cache.get(key)
+        if data is not None:
+            return data
+        if time.monotonic() >= deadline:
+            # Считающий запрос завис или упал - не ждать его дольше
+            break
+    return None
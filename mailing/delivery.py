@@ -0,0 +1,108 @@
+import smtplib
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+from mailing.throttle import get_rate_limiter
+
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+# Ошибки без кода ответа SMTP, после которых письмо стоит отправить позже:
+# обрывы и таймауты соединения. smtplib.SMTPException тоже наследует
+# OSError, поэтому ошибки smtplib разбираются отдельно в is_transient()
+TRANSIENT_ERRORS = (OSError,)
+
+
+def smtp_code(error):
+    """Код ответа SMTP-сервера из исключения smtplib или None"""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code
+    if isinstance(error, smtplib.SMTPRecipientsRefused) and error.recipients:
+        code, _ = next(iter(error.recipients.values()))
+        return code
+    return None
+
+
+def is_throttled(error):
+    """Временный отказ 4xx - провайдер просит снизить скорость"""
+    code = smtp_code(error)
+    return code is not None and 400 <= code < 500
+
+
+def is_transient(error):
+    """
+    Временная ошибка (4xx, обрыв соединения) - письмо можно отправить позже.
+    Ответы 5xx (нет такого ящика, письмо отклонено), ошибки smtplib без кода
+    ответа (сервер не поддерживает STARTTLS или авторизацию) и прочие ошибки
+    считаются постоянными
+    """
+    code = smtp_code(error)
+    if code is not None:
+        return 400 <= code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return isinstance(error, smtplib.SMTPServerDisconnected)
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class SMTPSession:
+    """
+    Отправка писем рассылки через одно SMTP-соединение.
+
+    Соединение открывается при первой отправке и переиспользуется, поэтому
+    SSL-рукопожатие и авторизация выполняются один раз на пачку из
+    batch_size писем, а не на каждого получателя. Если сервер разорвал
+    сессию, выполняется переподключение и письмо отправляется повторно.
+
+    Перед каждым письмом берется токен у общего ограничителя скорости
+    (mailing.throttle, если он включен), ответы 4xx замедляют отправку
+    всех обработчиков.
+    """
+
+    def __init__(self, batch_size=None, connection=None, limiter=None):
+        self.batch_size = batch_size or settings.MAILING_SMTP_BATCH_SIZE
+        self.connection = connection or get_connection(fail_silently=False)
+        self.limiter = limiter or get_rate_limiter()
+        self.sent_in_batch = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        try:
+            self.connection.close()
+        except smtplib.SMTPException:
+            pass
+        self.sent_in_batch = 0
+
+    def send(self, message):
+        """Отправляет одно письмо, при ошибке выбрасывает исключение"""
+        if self.sent_in_batch >= self.batch_size:
+            self.close()
+        daily_key = self.limiter.acquire() if self.limiter else None
+
+        try:
+            try:
+                self._send(message)
+            except RECONNECT_ERRORS:
+                self.close()
+                self._send(message)
+        except Exception as e:
+            if self.limiter:
+                # Неотправленное письмо не расходует дневной лимит
+                self.limiter.refund(daily_key)
+                if is_throttled(e):
+                    self.limiter.slow_down()
+            raise
+
+        if self.limiter:
+            self.limiter.speed_up()
+        self.sent_in_batch += 1
+
+    def _send(self, message):
+        # open() ничего не делает, если соединение уже открыто; без него
+        # send_messages() открывал бы и закрывал соединение на каждое письмо
+        self.connection.open()
+        self.connection.send_messages([message])
@@ -0,0 +1,36 @@
+"""
+Выгрузка в CSV без сборки файла в памяти.
+
+Строки читаются из базы курсором на стороне сервера (QuerySet.iterator()
+в PostgreSQL) пачками по EXPORT_CHUNK_SIZE и сразу отдаются клиенту через
+StreamingHttpResponse, поэтому память не зависит от размера выгрузки.
+"""
+
+import csv
+
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку, а не пишет ее"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    # BOM, чтобы Excel открыл файл в UTF-8
+    yield "\ufeff" + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def streaming_csv_response(filename, header, rows):
+    response = StreamingHttpResponse(
+        csv_lines(header, rows), content_type="text/csv; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,154 @@
+from datetime import datetime, time, timedelta
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+
+from mailing.models import Mailing
+from mailing.services import set_mailing_recipients
+from recipients.forms import RecipientAutocompleteWidget
+from users.forms import StyleFormMixin
+from users.models import User
+
+
+def day_start(day):
+    """Начало суток day в текущем часовом поясе"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class MailingForm(forms.ModelForm):
+    class Meta:
+        model = Mailing
+        fields = ["start_time", "end_time", "message", "recipients", "segment"]
+        # Проверка выбранных получателей - запрос pk__in только по
+        # отправленным id (ModelMultipleChoiceField), весь список не читается
+        widgets = {"recipients": RecipientAutocompleteWidget}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get("recipients") and not cleaned_data.get("segment"):
+            raise ValidationError("Выберите получателей или сегмент клиентов")
+        return cleaned_data
+
+    def _save_m2m(self):
+        # Получатели сохраняются пачками вместо recipients.set(), который
+        # вставляет все новые строки таблицы связи одним запросом
+        recipients = self.cleaned_data.pop("recipients", None)
+        super()._save_m2m()
+        if recipients is not None:
+            set_mailing_recipients(self.instance, recipients)
+            self.cleaned_data["recipients"] = recipients
+
+
+class ManagerFilterForm(StyleFormMixin, forms.Form):
+    """
+    Фильтр списка менеджера. Поиск q ищет подстроку (icontains) в полях
+    search_fields, даты ограничивают поле date_field. Границы дат
+    передаются как время, а не через __date, чтобы работал индекс по полю
+    """
+
+    search_fields = ()
+    date_field = None
+
+    q = forms.CharField(label="Поиск", required=False)
+
+    def filter(self, queryset):
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+
+        query = data.get("q", "").strip()
+        if query:
+            condition = Q()
+            for field in self.search_fields:
+                condition |= Q(**{f"{field}__icontains": query})
+            queryset = queryset.filter(condition)
+
+        if data.get("date_from"):
+            queryset = queryset.filter(
+                **{f"{self.date_field}__gte": day_start(data["date_from"])}
+            )
+        if data.get("date_to"):
+            queryset = queryset.filter(
+                **{f"{self.date_field}__lt": day_start(data["date_to"] + timedelta(1))}
+            )
+        return self.filter_fields(queryset, data)
+
+    def filter_fields(self, queryset, data):
+        return queryset
+
+
+class ManagerUserFilterForm(ManagerFilterForm):
+    BLOCKED_CHOICES = [
+        ("", "Все"),
+        ("1", "Заблокированные"),
+        ("0", "Активные"),
+    ]
+
+    search_fields = ("email", "first_name", "last_name")
+    date_field = "date_joined"
+
+    role = forms.ChoiceField(
+        label="Роль", choices=[("", "Все роли")] + User.Role.choices, required=False
+    )
+    is_blocked = forms.ChoiceField(
+        label="Блокировка", choices=BLOCKED_CHOICES, required=False
+    )
+    date_from = forms.DateField(
+        label="Зарегистрирован с",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}),
+    )
+    date_to = forms.DateField(
+        label="Зарегистрирован по",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}),
+    )
+
+    def filter_fields(self, queryset, data):
+        if data["role"]:
+            queryset = queryset.filter(role=data["role"])
+        if data["is_blocked"]:
+            queryset = queryset.filter(is_blocked=data["is_blocked"] == "1")
+        return queryset
+
+
+class ManagerMailingFilterForm(ManagerFilterForm):
+    STATUS_CHOICES = (
+        [("", "Все статусы")] + Mailing.STATUS_CHOICES + [("disabled", "Отключена")]
+    )
+
+    search_fields = ("message__topic_message", "owner__email")
+    date_field = "start_time"
+
+    status = forms.ChoiceField(label="Статус", choices=STATUS_CHOICES, required=False)
+    owner = forms.EmailField(label="Email владельца", required=False)
+    date_from = forms.DateField(
+        label="Начало с",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}),
+    )
+    date_to = forms.DateField(
+        label="Начало по",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}),
+    )
+
+    def filter_fields(self, queryset, data):
+        if data["status"]:
+            queryset = queryset.filter(status=data["status"])
+        if data["owner"]:
+            queryset = queryset.filter(owner__email__iexact=data["owner"])
+        return queryset
+
+
+class ManagerRecipientFilterForm(ManagerFilterForm):
+    search_fields = ("email", "full_name")
+
+    owner = forms.EmailField(label="Email владельца", required=False)
+
+    def filter_fields(self, queryset, data):
+        if data["owner"]:
+            queryset = queryset.filter(owner__email__iexact=data["owner"])
+        return queryset
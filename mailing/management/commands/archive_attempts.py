@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from mailing.services import archive_attempts
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит старые попытки отправки в архив (почасовые счетчики "
+        "MailingAttemptArchive). Статистика рассылок при этом не меняется"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.MAILING_ATTEMPT_RETENTION_DAYS,
+            help="Архивировать попытки старше N суток",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.MAILING_CHUNK_SIZE,
+            help="Количество попыток в одной транзакции",
+        )
+        parser.add_argument(
+            "--export-dir",
+            help="Папка, куда сохранить сами попытки (JSON Lines, gzip)",
+        )
+
+    def handle(self, *args, **options):
+        days = options.get("days")
+        batch_size = options.get("batch_size")
+        export_dir = options.get("export_dir")
+
+        if days < 1:
+            raise CommandError("Количество суток должно быть больше нуля")
+        if batch_size < 1:
+            raise CommandError("Размер пачки должен быть больше нуля")
+
+        before = timezone.now() - timedelta(days=days)
+        archived = archive_attempts(before, batch_size, export_dir)
+        self.stdout.write(self.style.SUCCESS(f"Перенесено в архив попыток: {archived}"))
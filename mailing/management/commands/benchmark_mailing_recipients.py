@@ -0,0 +1,158 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from mailing.models import Mailing
+from mailing.services import (add_mailing_recipients, clear_mailing_recipients,
+                              remove_mailing_recipients,
+                              set_mailing_recipients)
+from messaging.models import Message
+from recipients.models import Recipient
+from users.models import User
+
+SEED_EMAIL = "benchmark-recipients@example.com"
+
+# Сколько тестовых клиентов создается одним запросом
+SEED_BATCH_SIZE = 10_000
+
+
+def measure(function):
+    started = time.perf_counter()
+    result = function()
+    return time.perf_counter() - started, result
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет добавление и удаление получателей рассылки пачками "
+        "(add/remove/set/clear_mailing_recipients) и, по желанию, через "
+        "recipients.add()/clear() Django"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000, 1_000_000],
+            help="Количество получателей в замерах",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.MAILING_CHUNK_SIZE,
+            help="Количество строк таблицы связи в одном запросе",
+        )
+        parser.add_argument(
+            "--django",
+            action="store_true",
+            help="Также замерить recipients.add() и recipients.clear()",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Удалить тестовых клиентов и рассылку и завершить работу",
+        )
+
+    def handle(self, *args, **options):
+        if options.get("clear"):
+            deleted, _ = User.objects.filter(email=SEED_EMAIL).delete()
+            self.stdout.write(self.style.SUCCESS(f"Удалено объектов: {deleted}"))
+            return
+
+        sizes = sorted(options.get("sizes"))
+        chunk_size = options.get("chunk_size")
+        if sizes[0] < 1 or chunk_size < 1:
+            raise CommandError("Размеры и размер пачки должны быть больше нуля")
+
+        owner, _ = User.objects.get_or_create(email=SEED_EMAIL)
+        self.seed_recipients(owner, sizes[-1])
+        mailing = self.get_mailing(owner)
+        clear_mailing_recipients(mailing)
+        recipients = Recipient.objects.filter(owner=owner).order_by("pk")
+
+        self.stdout.write(f"Размер пачки: {chunk_size}")
+        for size in sizes:
+            ids = list(recipients.values_list("pk", flat=True)[:size])
+            half = ids[::2]
+            steps = [
+                (
+                    "добавление",
+                    lambda: add_mailing_recipients(mailing, ids, chunk_size),
+                ),
+                (
+                    "повторное добавление",
+                    lambda: add_mailing_recipients(mailing, ids, chunk_size),
+                ),
+                (
+                    "удаление половины",
+                    lambda: remove_mailing_recipients(mailing, half, chunk_size),
+                ),
+                (
+                    "замена на другую половину",
+                    lambda: sum(set_mailing_recipients(mailing, half, chunk_size)),
+                ),
+                ("очистка", lambda: clear_mailing_recipients(mailing)),
+            ]
+            if options.get("django"):
+                steps += self.django_steps(mailing, ids)
+
+            self.stdout.write(self.style.SUCCESS(f"\nПолучателей: {size}"))
+            for title, step in steps:
+                seconds, rows = measure(step)
+                self.stdout.write(
+                    f"{title:<28} {seconds:8.3f} с  строк: {rows:>9}  "
+                    f"({seconds / size * 1_000_000:.2f} мкс на получателя)"
+                )
+
+    def django_steps(self, mailing, ids):
+        """recipients.add()/clear() для сравнения, в транзакции, как в API"""
+
+        def add():
+            with transaction.atomic():
+                mailing.recipients.add(*ids)
+            return len(ids)
+
+        def clear():
+            with transaction.atomic():
+                mailing.recipients.clear()
+            return len(ids)
+
+        return [("recipients.add()", add), ("recipients.clear()", clear)]
+
+    def seed_recipients(self, owner, count):
+        """Добавляет недостающих тестовых клиентов пачками по SEED_BATCH_SIZE"""
+        existing = Recipient.objects.filter(owner=owner).count()
+        for start in range(existing, count, SEED_BATCH_SIZE):
+            Recipient.objects.bulk_create(
+                [
+                    Recipient(
+                        owner=owner,
+                        email=f"benchmark-{number}@example.com",
+                        full_name=f"Получатель {number}",
+                    )
+                    for number in range(start, min(start + SEED_BATCH_SIZE, count))
+                ]
+            )
+        if existing < count:
+            self.stdout.write(f"Создано тестовых клиентов: {count - existing}")
+
+    def get_mailing(self, owner):
+        mailing = Mailing.objects.filter(owner=owner).first()
+        if mailing:
+            return mailing
+        now = timezone.now()
+        message = Message.objects.create(
+            owner=owner, topic_message="Тест", text_message="Тест"
+        )
+        # Рассылка отключена, чтобы планировщик и обработчик ее не отправили
+        return Mailing.objects.create(
+            owner=owner,
+            message=message,
+            status="disabled",
+            start_time=now,
+            end_time=now,
+        )
@@ -0,0 +1,196 @@
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from mailing.models import Mailing, MailingAttempt, MailingDelivery, MailingJob
+from mailing.services import annotate_statistics, rebuild_mailing_stats
+from messaging.models import Message
+from recipients.models import Recipient
+from users.models import User
+
+SEED_EMAIL = "explain-queries@example.com"
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу тестовыми рассылками и выводит план выполнения "
+        "(EXPLAIN ANALYZE) основных запросов рассылок"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mailings", type=int, default=20000, help="Количество рассылок"
+        )
+        parser.add_argument(
+            "--attempts",
+            type=int,
+            default=50,
+            help="Количество попыток отправки на рассылку",
+        )
+        parser.add_argument(
+            "--no-seed",
+            action="store_true",
+            help="Не добавлять данные, только вывести планы запросов",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Удалить тестовые данные и завершить работу",
+        )
+
+    def handle(self, *args, **options):
+        if options.get("clear"):
+            deleted, _ = User.objects.filter(email=SEED_EMAIL).delete()
+            self.stdout.write(self.style.SUCCESS(f"Удалено объектов: {deleted}"))
+            return
+
+        owner, _ = User.objects.get_or_create(email=SEED_EMAIL)
+        if not options.get("no_seed"):
+            self.seed(owner, options.get("mailings"), options.get("attempts"))
+
+        for title, queryset in self.hot_queries(owner):
+            self.stdout.write(self.style.SUCCESS(f"\n{title}"))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(self.explain(queryset))
+
+    def seed(self, owner, mailings_count, attempts_count):
+        """
+        Добавляет рассылки тестового пользователя, попытки их отправки и
+        задания. Большая часть рассылок завершена, как в рабочей базе.
+        Окна отправки всех рассылок уже прошли, а доставки отправлены или
+        завершились ошибкой, чтобы планировщик и обработчики ничего не
+        отправили на тестовый адрес
+        """
+        now = timezone.now()
+        statuses = ["completed"] * 8 + ["created", "running"]
+        windows = []
+        for _ in range(mailings_count):
+            start_time = now - timedelta(days=random.randint(31, 365))
+            windows.append(
+                (start_time, start_time + timedelta(days=random.randint(1, 30)))
+            )
+
+        with transaction.atomic():
+            message = Message.objects.create(
+                owner=owner, topic_message="Тест", text_message="Тест"
+            )
+            recipient, _ = Recipient.objects.get_or_create(
+                email=SEED_EMAIL, defaults={"owner": owner, "full_name": "Тест"}
+            )
+            mailings = Mailing.objects.bulk_create(
+                [
+                    Mailing(
+                        owner=owner,
+                        message=message,
+                        status=random.choice(statuses),
+                        start_time=start_time,
+                        end_time=end_time,
+                    )
+                    for start_time, end_time in windows
+                ],
+                batch_size=1000,
+            )
+            self.stdout.write(f"Добавлено рассылок: {len(mailings)}")
+
+            attempts = []
+            for mailing in mailings:
+                for _ in range(attempts_count):
+                    attempts.append(
+                        MailingAttempt(
+                            mailing=mailing,
+                            datetime_attempt=mailing.start_time,
+                            status="success" if random.random() < 0.9 else "failed",
+                            mail_server_response="",
+                        )
+                    )
+                if len(attempts) >= 10000:
+                    MailingAttempt.objects.bulk_create(attempts)
+                    attempts = []
+            MailingAttempt.objects.bulk_create(attempts)
+            self.stdout.write(f"Добавлено попыток: {len(mailings) * attempts_count}")
+
+            MailingJob.objects.bulk_create(
+                [MailingJob(mailing=mailing, status="done") for mailing in mailings],
+                batch_size=1000,
+            )
+            MailingDelivery.objects.bulk_create(
+                [
+                    MailingDelivery(
+                        mailing=mailing,
+                        recipient=recipient,
+                        status="sent" if random.random() < 0.9 else "failed",
+                        attempt_count=1,
+                    )
+                    for mailing in mailings
+                ],
+                batch_size=1000,
+            )
+            rebuild_mailing_stats(Mailing.objects.filter(owner=owner))
+            self.check_nothing_due(owner, now)
+
+        # Без свежей статистики планировщик выбирает план по пустым таблицам
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                for model in (Mailing, MailingAttempt, MailingDelivery, MailingJob):
+                    cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    def check_nothing_due(self, owner, now):
+        """Ни одна тестовая рассылка и доставка не должна уйти на отправку"""
+        due_mailings = Mailing.objects.filter(
+            owner=owner, status__in=["created", "running"], end_time__gte=now
+        )
+        due_deliveries = MailingDelivery.objects.filter(
+            mailing__owner=owner, status__in=["pending", "retry"]
+        )
+        if due_mailings.exists() or due_deliveries.exists():
+            raise CommandError(
+                "Тестовые данные попали бы в отправку, добавление отменено"
+            )
+
+    def hot_queries(self, owner):
+        now = timezone.now()
+        mailing = Mailing.objects.filter(owner=owner).first()
+        return [
+            (
+                "Рассылки к отправке (send_newsletter)",
+                Mailing.objects.filter(
+                    status__in=["created", "running"],
+                    start_time__lte=now,
+                    end_time__gte=now,
+                ),
+            ),
+            (
+                "Рассылки владельца (OwnerQuerysetMixin)",
+                Mailing.objects.filter(owner=owner),
+            ),
+            (
+                "Активные рассылки владельца (статистика)",
+                Mailing.objects.filter(owner=owner, status="running"),
+            ),
+            (
+                "Статистика рассылок владельца (annotate_statistics)",
+                annotate_statistics(Mailing.objects.filter(owner=owner)),
+            ),
+            (
+                "Успешные попытки рассылки",
+                MailingAttempt.objects.filter(mailing=mailing, status="success"),
+            ),
+            (
+                "Очередь заданий (run_mail_worker)",
+                MailingJob.objects.filter(status="queued").order_by("created_at")[:1],
+            ),
+            (
+                "Очередь повторов (send_due_retries)",
+                MailingDelivery.objects.filter(
+                    status="retry", next_attempt_at__lte=now
+                ).order_by("next_attempt_at")[:1000],
+            ),
+        ]
+
+    def explain(self, queryset):
+        if connection.vendor == "postgresql":
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
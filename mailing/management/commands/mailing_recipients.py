@@ -0,0 +1,95 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from mailing.models import Mailing
+from mailing.services import (add_mailing_recipients, clear_mailing_recipients,
+                              recipient_id_chunks, remove_mailing_recipients)
+from recipients.models import Recipient
+
+
+class Command(BaseCommand):
+    help = (
+        "Добавляет или убирает получателей рассылки пачками: id клиентов "
+        "из файла (по одному в строке) или все клиенты владельца рассылки"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("mailing_id", type=int, help="ID рассылки")
+        parser.add_argument("action", choices=["add", "remove", "clear"])
+        parser.add_argument(
+            "--ids-file", help="Файл с id клиентов, '-' - стандартный ввод"
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Все клиенты владельца рассылки вместо файла с id",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.MAILING_CHUNK_SIZE,
+            help="Количество строк таблицы связи в одном запросе",
+        )
+
+    def handle(self, *args, **options):
+        action = options.get("action")
+        chunk_size = options.get("chunk_size")
+
+        if chunk_size < 1:
+            raise CommandError("Размер пачки должен быть больше нуля")
+        try:
+            mailing = Mailing.objects.get(pk=options.get("mailing_id"))
+        except Mailing.DoesNotExist:
+            raise CommandError(f"Рассылка с ID {options.get('mailing_id')} не найдена")
+
+        if action == "clear":
+            removed = clear_mailing_recipients(mailing)
+            self.stdout.write(self.style.SUCCESS(f"Убрано получателей: {removed}"))
+            return
+
+        owner_recipients = Recipient.objects.filter(owner_id=mailing.owner_id)
+        if options.get("all"):
+            recipients = owner_recipients
+        else:
+            recipients = self.read_ids(options.get("ids_file"))
+            if action == "add":
+                recipients = self.owned_ids(owner_recipients, recipients, chunk_size)
+
+        if action == "add":
+            added = add_mailing_recipients(mailing, recipients, chunk_size)
+            self.stdout.write(self.style.SUCCESS(f"Добавлено получателей: {added}"))
+        else:
+            removed = remove_mailing_recipients(mailing, recipients, chunk_size)
+            self.stdout.write(self.style.SUCCESS(f"Убрано получателей: {removed}"))
+
+    def read_ids(self, path):
+        if not path:
+            raise CommandError("Укажите --ids-file или --all")
+        try:
+            stream = sys.stdin if path == "-" else open(path)
+            with stream:
+                return {int(line) for line in stream if line.strip()}
+        except OSError as e:
+            raise CommandError(f"Не удалось прочитать файл: {e}")
+        except ValueError:
+            raise CommandError("В файле должны быть только id клиентов")
+
+    def owned_ids(self, owner_recipients, ids, chunk_size):
+        """
+        id из файла, которые принадлежат клиентам владельца рассылки.
+        Проверяются пачками, чужие и несуществующие id пропускаются
+        """
+        owned = []
+        for chunk in recipient_id_chunks(ids, chunk_size):
+            owned.extend(
+                owner_recipients.filter(
+                    pk__range=(chunk[0], chunk[-1]), pk__in=chunk
+                ).values_list("pk", flat=True)
+            )
+        if len(owned) < len(ids):
+            self.stderr.write(
+                f"Пропущено чужих или несуществующих id: {len(ids) - len(owned)}"
+            )
+        return owned
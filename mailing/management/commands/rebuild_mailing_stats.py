@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from mailing.models import Mailing
+from mailing.services import rebuild_mailing_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счетчики попыток рассылок (MailingStats) по таблице "
+        "попыток. Запускайте, когда рассылки не отправляются: попытки, "
+        "записанные во время пересчета, могут не попасть в счетчики"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mailing-id", type=int, help="ID рассылки (по умолчанию все)"
+        )
+
+    def handle(self, *args, **options):
+        mailing_id = options.get("mailing_id")
+
+        mailings = Mailing.objects.all()
+        if mailing_id:
+            mailings = mailings.filter(id=mailing_id)
+
+        count = rebuild_mailing_stats(mailings)
+        self.stdout.write(
+            self.style.SUCCESS(f"Пересчитана статистика {count} рассылок")
+        )
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from mailing.services import rebuild_attempt_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает почасовые и посуточные счетчики попыток отправки "
+        "(MailingAttemptRollup) по таблице попыток. Новые попытки попадают "
+        "в счетчики при записи, команда нужна для заполнения по старым данным"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Пересчитать только последние N суток (по умолчанию все время)",
+        )
+
+    def handle(self, *args, **options):
+        days = options.get("days")
+
+        since = None
+        if days is not None:
+            if days < 1:
+                raise CommandError("Количество суток должно быть больше нуля")
+            since = timezone.now() - timedelta(days=days - 1)
+
+        count = rebuild_attempt_rollups(since)
+        self.stdout.write(self.style.SUCCESS(f"Записано счетчиков: {count}"))
@@ -0,0 +1,117 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from mailing.models import MailingJob
+from mailing.services import (requeue_stale_jobs, run_mailing_job,
+                              send_due_retries)
+from mailing.throttle import DailyLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Фоновый обработчик заданий на отправку рассылок "
+        "и повторной отправки после временных ошибок"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5,
+            help="Пауза в секундах, если в очереди нет заданий",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Обработать задания из очереди и завершить работу",
+        )
+
+    def handle(self, *args, **options):
+        poll_interval = options.get("poll_interval")
+        once = options.get("once")
+
+        self.stdout.write(self.style.SUCCESS("Обработчик заданий запущен"))
+
+        try:
+            while True:
+                job = self.claim_job()
+                if job is None:
+                    if self.send_retries():
+                        continue
+                    if once:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                self.stdout.write(
+                    f"Задание #{job.id}: рассылка #{job.mailing_id} запущена"
+                )
+                job = run_mailing_job(job)
+
+                if job.status == "done":
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"Задание #{job.id} завершено: "
+                            f"Успешно: {job.success_count}, Ошибок: {job.failed_count}"
+                        )
+                    )
+                else:
+                    logger.error(f"Задание #{job.id} завершилось ошибкой: {job.error}")
+                    self.stdout.write(
+                        self.style.ERROR(f"✗ Задание #{job.id}: {job.error}")
+                    )
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("\nОбработчик остановлен"))
+
+    def send_retries(self):
+        """Отправляет повторы, время которых подошло; True, если они были"""
+        try:
+            results = send_due_retries()
+        except DailyLimitExceeded as e:
+            self.stdout.write(self.style.ERROR(f"✗ {e}"))
+            return False
+
+        if not (results["success"] or results["failed"]):
+            return False
+        self.stdout.write(
+            f"Повторная отправка: Успешно: {results['success']}, "
+            f"Ошибок: {results['failed']}"
+        )
+        return True
+
+    def claim_job(self):
+        """
+        Забирает самое старое задание из очереди. SKIP LOCKED позволяет
+        запускать несколько обработчиков без двойной отправки. Задания,
+        брошенные убитым обработчиком, сначала возвращаются в очередь
+        """
+        requeued = requeue_stale_jobs()
+        if requeued:
+            logger.warning(f"Возвращено в очередь прерванных заданий: {requeued}")
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Возвращено в очередь прерванных заданий: {requeued}"
+                )
+            )
+
+        with transaction.atomic():
+            job = (
+                MailingJob.objects.select_for_update(skip_locked=True, of=("self",))
+                .select_related("mailing__message")
+                .filter(status="queued")
+                .order_by("created_at")
+                .first()
+            )
+            if job is None:
+                return None
+
+            job.status = "running"
+            job.started_at = job.heartbeat_at = timezone.now()
+            job.save(update_fields=["status", "started_at", "heartbeat_at"])
+        return job
@@ -0,0 +1,162 @@
+import heapq
+import logging
+import time
+
+import psycopg
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from mailing.models import Mailing
+from mailing.services import enqueue_mailing
+from mailing.signals import SCHEDULE_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Планировщик рассылок: ставит рассылку в очередь run_mail_worker "
+        "в момент ее начала. Изменения рассылок получает через LISTEN/NOTIFY"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--resync-interval",
+            type=float,
+            default=3600,
+            help="Раз во сколько секунд перечитывать расписание целиком",
+        )
+
+    def handle(self, *args, **options):
+        resync_interval = options.get("resync_interval")
+
+        # Очередь (start_time, id рассылки). При изменении рассылки старая
+        # запись остается в куче и пропускается, если не совпадает с scheduled
+        self.queue = []
+        self.scheduled = {}
+
+        listener = None
+        next_resync = 0
+
+        self.stdout.write(self.style.SUCCESS("Планировщик рассылок запущен"))
+
+        try:
+            while True:
+                if listener is None:
+                    listener = self.listen()
+                    next_resync = 0
+
+                if time.monotonic() >= next_resync:
+                    self.resync()
+                    next_resync = time.monotonic() + resync_interval
+
+                self.run_due()
+
+                timeout = next_resync - time.monotonic()
+                if self.queue:
+                    until_due = (self.queue[0][0] - timezone.now()).total_seconds()
+                    timeout = min(timeout, until_due)
+
+                try:
+                    for mailing_id in self.wait(listener, max(timeout, 0)):
+                        self.reschedule(mailing_id)
+                except psycopg.OperationalError as e:
+                    # Соединение для LISTEN потеряно: уведомления могли
+                    # пропасть, поэтому после переподключения - полная сверка
+                    logger.error(f"Потеряно соединение планировщика: {str(e)}")
+                    listener = None
+                    time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("\nПланировщик остановлен"))
+        finally:
+            if listener:
+                listener.close()
+
+    def listen(self):
+        """Отдельное соединение PostgreSQL, подписанное на канал расписания"""
+        if connection.vendor != "postgresql":
+            self.stdout.write(
+                self.style.WARNING(
+                    "LISTEN/NOTIFY доступен только в PostgreSQL, изменения "
+                    "рассылок будут видны после очередной сверки расписания"
+                )
+            )
+            return False
+
+        listener = connection.get_new_connection(connection.get_connection_params())
+        listener.autocommit = True
+        listener.execute(f"LISTEN {SCHEDULE_CHANNEL}")
+        return listener
+
+    def wait(self, listener, timeout):
+        """Ждет уведомления не дольше timeout секунд, возвращает id рассылок"""
+        if not listener:
+            time.sleep(timeout)
+            return []
+        return [
+            int(notify.payload)
+            for notify in listener.notifies(timeout=timeout, stop_after=1)
+        ]
+
+    def schedule(self, mailing_id, start_time):
+        self.scheduled[mailing_id] = start_time
+        heapq.heappush(self.queue, (start_time, mailing_id))
+
+    def resync(self):
+        """
+        Полностью перечитывает расписание. Уже начатые рассылки (running)
+        попадают в очередь сразу: это продолжение после сбоя обработчика
+        """
+        self.queue = []
+        self.scheduled = {}
+        mailings = Mailing.objects.filter(
+            status__in=["created", "running"], end_time__gte=timezone.now()
+        ).values_list("id", "start_time")
+        for mailing_id, start_time in mailings:
+            self.schedule(mailing_id, start_time)
+        self.stdout.write(f"Расписание загружено: {len(self.scheduled)} рассылок")
+
+    def reschedule(self, mailing_id):
+        """
+        Обновляет рассылку в расписании по уведомлению. Сюда же приходят
+        уведомления о смене статуса при отправке, поэтому в очередь попадают
+        только еще не начатые рассылки
+        """
+        mailing = (
+            Mailing.objects.filter(
+                id=mailing_id, status="created", end_time__gte=timezone.now()
+            )
+            .only("start_time")
+            .first()
+        )
+        if mailing is None:
+            self.scheduled.pop(mailing_id, None)
+        elif self.scheduled.get(mailing_id) != mailing.start_time:
+            self.schedule(mailing_id, mailing.start_time)
+
+    def run_due(self):
+        """Ставит в очередь отправки рассылки, время которых наступило"""
+        now = timezone.now()
+        while self.queue and self.queue[0][0] <= now:
+            start_time, mailing_id = heapq.heappop(self.queue)
+            if self.scheduled.get(mailing_id) != start_time:
+                continue
+            del self.scheduled[mailing_id]
+
+            mailing = Mailing.objects.filter(
+                id=mailing_id,
+                status__in=["created", "running"],
+                start_time__lte=now,
+                end_time__gte=now,
+            ).first()
+            if mailing is None:
+                continue
+
+            job, created = enqueue_mailing(mailing)
+            if created:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Рассылка #{mailing_id} поставлена в очередь, задание #{job.id}"
+                    )
+                )
@@ -1,11 +1,21 @@
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
-from django.core.mail import send_mail
-from django.core.management.base import BaseCommand
+from django.core.mail import EmailMessage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from django.utils import timezone
 
-from mailing.models import Mailing, MailingAttempt
+from mailing.attempts import AttemptWriter
+from mailing.delivery import SMTPSession
+from mailing.models import Mailing
+from mailing.services import (finish_mailing, keyset_chunks,
+                              pending_deliveries, prepare_outbox)
+from mailing.throttle import DailyLimitExceeded
+from messaging.templating import MessageTemplate
 
 logger = logging.getLogger(__name__)
 
@@ -27,10 +37,20 @@ class Command(BaseCommand):
             action="store_true",
             help="Тестовый режим (не создает MailingAttempt)",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Количество потоков отправки, у каждого своё SMTP-соединение",
+        )
 
     def handle(self, *args, **options):
         mailing_id = options.get("mailing_id")
         test_mode = options.get("test")
+        workers = options.get("workers")
+
+        if workers < 1:
+            raise CommandError("Количество потоков должно быть больше нуля")
 
         now = timezone.now()
 
@@ -58,7 +78,7 @@ class Command(BaseCommand):
         for mailing in mailings:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'\nОбработка рассылки #{mailing.id}: "{mailing.message.subject}"'
+                    f'\nОбработка рассылки #{mailing.id}: "{mailing.message.topic_message}"'
                 )
             )
 
@@ -66,58 +86,20 @@ class Command(BaseCommand):
                 mailing.status = "running"
                 mailing.save()
 
-            recipients = mailing.recipients.all()
-            self.stdout.write(f"Получателей: {recipients.count()}")
-
-            mailing_sent = 0
-            mailing_failed = 0
-
-            for recipient in recipients:
-                try:
-                    if test_mode:
-                        self.stdout.write(
-                            f"[ТЕСТ] Отправка для: {recipient.full_name} ({recipient.email})"
-                        )
-                        mailing_sent += 1
-                    else:
-                        success = self.send_email_to_recipient(mailing, recipient)
-
-                        if success:
-                            mailing_sent += 1
-                            MailingAttempt.objects.create(
-                                datetime_attempt=now,
-                                status="success",
-                                mail_server_response="Успешно отправлено",
-                                mailing=mailing,
-                            )
-                        else:
-                            mailing_failed += 1
-                            MailingAttempt.objects.create(
-                                datetime_attempt=now,
-                                status="failed",
-                                mail_server_response="Ошибка отправки",
-                                mailing=mailing,
-                            )
-
-                except Exception as e:
-                    mailing_failed += 1
-                    logger.error(f"Ошибка отправки для {recipient.email}: {str(e)}")
-
-                    if not test_mode:
-                        MailingAttempt.objects.create(
-                            datetime_attempt=now,
-                            status="failed",
-                            mail_server_response=str(e),
-                            mailing=mailing,
-                        )
+            prepare_outbox(mailing)
+            chunks = keyset_chunks(pending_deliveries(mailing))
+            template = MessageTemplate(mailing.message)
 
-                    self.stdout.write(
-                        self.style.ERROR(f"✗ Ошибка для {recipient.email}: {str(e)}")
-                    )
+            try:
+                mailing_sent, mailing_failed = self.process_recipients(
+                    mailing, template, chunks, test_mode, workers
+                )
+            except DailyLimitExceeded as e:
+                self.stdout.write(self.style.ERROR(f"✗ {e}. Отправка остановлена"))
+                break
 
-            if mailing_sent > 0 and mailing_failed == 0:
-                mailing.status = "completed"
-                mailing.save()
+            if not test_mode:
+                finish_mailing(mailing)
 
             total_processed += 1
             total_emails_sent += mailing_sent
@@ -137,33 +119,125 @@ class Command(BaseCommand):
             )
         )
 
-    def send_email_to_recipient(self, mailing, recipient):
-        """Отправка email конкретному получателю"""
-        try:
-            message = mailing.message
+    def process_recipients(self, mailing, template, chunks, test_mode, workers):
+        """
+        Раздает пачки получателей потокам и суммирует результаты рассылки.
+        Пачки читаются из БД по мере надобности, поток берет следующую пачку,
+        когда закончил предыдущую
+        """
+        lock = threading.Lock()
+
+        def deliveries():
+            while True:
+                with lock:
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                yield from chunk
+
+        if workers == 1:
+            results = [self.send_chunk(1, mailing, template, deliveries(), test_mode)]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(
+                        self.run_worker,
+                        number,
+                        mailing,
+                        template,
+                        deliveries(),
+                        test_mode,
+                    )
+                    for number in range(1, workers + 1)
+                ]
+                results = [future.result() for future in futures]
+
+        for result in results:
+            elapsed = result["elapsed"]
+            throughput = (
+                (result["sent"] + result["failed"]) / elapsed if elapsed > 0 else 0
+            )
+            self.stdout.write(
+                f"Поток {result['worker']}: Успешно: {result['sent']}, "
+                f"Ошибок: {result['failed']}, {throughput:.1f} писем/с"
+            )
 
-            email_body = message.body.replace("{full_name}", recipient.full_name)
-            email_body = email_body.replace("{email}", recipient.email)
+        return (
+            sum(result["sent"] for result in results),
+            sum(result["failed"] for result in results),
+        )
 
-            email_subject = message.subject
+    def run_worker(self, number, mailing, template, deliveries, test_mode):
+        """Поток отправки со своим SMTP-соединением и соединением с БД"""
+        try:
+            return self.send_chunk(number, mailing, template, deliveries, test_mode)
+        finally:
+            # Django открывает отдельное соединение с БД в каждом потоке,
+            # закрываем его, чтобы не оставлять висящих соединений
+            connections.close_all()
+
+    def send_chunk(self, number, mailing, template, deliveries, test_mode):
+        """Отправка писем части получателей рассылки"""
+        mailing_sent = 0
+        mailing_failed = 0
+        started = time.monotonic()
+
+        with SMTPSession() as session, AttemptWriter() as attempts:
+            for delivery in deliveries:
+                recipient = delivery.recipient
+                if test_mode:
+                    self.stdout.write(
+                        f"[ТЕСТ] Отправка для: {recipient.full_name} ({recipient.email})"
+                    )
+                    mailing_sent += 1
+                    continue
+
+                try:
+                    self.send_email_to_recipient(session, template, recipient)
+                except DailyLimitExceeded:
+                    raise
+                except Exception as e:
+                    mailing_failed += 1
+                    logger.error(f"Ошибка отправки для {recipient.email}: {str(e)}")
+                    attempts.add(mailing, "failed", str(e), delivery=delivery, error=e)
+                    self.stdout.write(
+                        self.style.ERROR(f"✗ Ошибка для {recipient.email}: {str(e)}")
+                    )
+                    continue
+
+                # Успех записывается вне try: ошибка записи буфера попыток
+                # не должна превращать отправленное письмо в неудачное.
+                # Время попытки AttemptWriter ставит сам в момент записи
+                mailing_sent += 1
+                attempts.add(
+                    mailing, "success", "Успешно отправлено", delivery=delivery
+                )
 
-            send_mail(
+        return {
+            "worker": number,
+            "sent": mailing_sent,
+            "failed": mailing_failed,
+            "elapsed": time.monotonic() - started,
+        }
+
+    def send_email_to_recipient(self, session, template, recipient):
+        """
+        Отправка email конкретному получателю через открытую SMTP-сессию.
+        Ошибка отправки пробрасывается, по ней решается, повторять ли письмо
+        """
+        email_subject, email_body = template.render(recipient)
+
+        session.send(
+            EmailMessage(
                 subject=email_subject,
-                message=email_body,
+                body=email_body,
                 from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient.email],
-                fail_silently=False,
-            )
-
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"✓ Отправлено: {recipient.full_name} ({recipient.email})"
-                )
+                to=[recipient.email],
             )
-            return True
+        )
 
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f"✗ Ошибка отправки для {recipient.email}: {str(e)}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Отправлено: {recipient.full_name} ({recipient.email})"
             )
-            return False
+        )
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0003_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="mailing",
+            options={
+                "permissions": [
+                    ("can_view_all_mailings", "Может просматривать все рассылки")
+                ],
+                "verbose_name": "Рассылка",
+                "verbose_name_plural": "Рассылки",
+            },
+        ),
+        migrations.CreateModel(
+            name="MailingJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "В очереди"),
+                            ("running", "Выполняется"),
+                            ("done", "Завершена"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="queued",
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создана"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Запущена"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Завершена"
+                    ),
+                ),
+                (
+                    "total",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Всего получателей"
+                    ),
+                ),
+                (
+                    "success_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Успешно"),
+                ),
+                (
+                    "failed_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Не успешно"),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Ошибка")),
+                (
+                    "mailing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="jobs",
+                        to="mailing.mailing",
+                        verbose_name="Рассылка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Задание на отправку",
+                "verbose_name_plural": "Задания на отправку",
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0004_mailingjob"),
+        ("recipients", "0003_alter_recipient_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MailingDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Ожидает отправки"),
+                            ("sent", "Доставлено"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлено"),
+                ),
+                (
+                    "mailing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deliveries",
+                        to="mailing.mailing",
+                        verbose_name="Рассылка",
+                    ),
+                ),
+                (
+                    "recipient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deliveries",
+                        to="recipients.recipient",
+                        verbose_name="Получатель",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Доставка",
+                "verbose_name_plural": "Доставки",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("mailing", "recipient"), name="unique_mailing_recipient"
+                    )
+                ],
+            },
+        ),
+    ]
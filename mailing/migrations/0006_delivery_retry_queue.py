@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:11
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнить в транзакции
+    atomic = False
+
+    dependencies = [
+        ("mailing", "0005_mailingdelivery"),
+        ("recipients", "0003_alter_recipient_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailingdelivery",
+            name="attempt_count",
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name="Количество попыток"
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailingdelivery",
+            name="next_attempt_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Следующая попытка"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="mailingdelivery",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Ожидает отправки"),
+                    ("sent", "Доставлено"),
+                    ("retry", "Ожидает повтора"),
+                    ("failed", "Ошибка"),
+                ],
+                default="pending",
+                max_length=20,
+                verbose_name="Статус",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="mailingdelivery",
+            index=models.Index(
+                condition=models.Q(("status", "retry")),
+                fields=["next_attempt_at"],
+                name="delivery_retry_due_idx",
+            ),
+        ),
+    ]
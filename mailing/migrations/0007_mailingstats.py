@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def fill_stats(apps, schema_editor):
+    Mailing = apps.get_model("mailing", "Mailing")
+    MailingStats = apps.get_model("mailing", "MailingStats")
+    mailings = (
+        Mailing.objects.filter(attempts__isnull=False)
+        .annotate(
+            total=Count("attempts"),
+            success=Count("attempts", filter=Q(attempts__status="success")),
+            failed=Count("attempts", filter=Q(attempts__status="failed")),
+            last_attempt_at=Max("attempts__datetime_attempt"),
+        )
+        .values("id", "total", "success", "failed", "last_attempt_at")
+    )
+    MailingStats.objects.bulk_create(
+        [
+            MailingStats(
+                mailing_id=row["id"],
+                total=row["total"],
+                success=row["success"],
+                failed=row["failed"],
+                last_attempt_at=row["last_attempt_at"],
+            )
+            for row in mailings.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0006_delivery_retry_queue"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MailingStats",
+            fields=[
+                (
+                    "mailing",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="counters",
+                        serialize=False,
+                        to="mailing.mailing",
+                        verbose_name="Рассылка",
+                    ),
+                ),
+                (
+                    "total",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Всего попыток"
+                    ),
+                ),
+                (
+                    "success",
+                    models.PositiveIntegerField(default=0, verbose_name="Успешных"),
+                ),
+                (
+                    "failed",
+                    models.PositiveIntegerField(default=0, verbose_name="Неудачных"),
+                ),
+                (
+                    "last_attempt_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Последняя попытка"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика рассылки",
+                "verbose_name_plural": "Статистика рассылок",
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
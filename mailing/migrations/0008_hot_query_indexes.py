@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:16
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнить в транзакции
+    atomic = False
+
+    dependencies = [
+        ("mailing", "0007_mailingstats"),
+        ("messaging", "0003_message_placeholders_help"),
+        ("recipients", "0003_alter_recipient_options"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="mailing",
+            index=models.Index(
+                fields=["owner", "status"], name="mailing_owner_status_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="mailing",
+            index=models.Index(
+                condition=models.Q(("status__in", ["created", "running"])),
+                fields=["start_time", "end_time"],
+                name="mailing_active_window_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="mailingattempt",
+            index=models.Index(
+                fields=["mailing", "status"], name="attempt_mailing_status_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="mailingjob",
+            index=models.Index(
+                condition=models.Q(("status", "queued")),
+                fields=["created_at"],
+                name="job_queue_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0008_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MailingAttemptRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("hour", "Час"), ("day", "Сутки")],
+                        max_length=10,
+                        verbose_name="Период",
+                    ),
+                ),
+                ("bucket", models.DateTimeField(verbose_name="Начало периода")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("success", "Успешно"), ("failed", "Не успешно")],
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество попыток"
+                    ),
+                ),
+                (
+                    "mailing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rollups",
+                        to="mailing.mailing",
+                        verbose_name="Рассылка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Попытки за период",
+                "verbose_name_plural": "Попытки за период",
+                "indexes": [
+                    models.Index(
+                        fields=["period", "bucket"], name="attempt_rollup_bucket_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("mailing", "period", "bucket", "status"),
+                        name="unique_attempt_rollup",
+                    )
+                ],
+            },
+        ),
+    ]
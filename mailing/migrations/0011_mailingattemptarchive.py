@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0010_owner_keyset_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MailingAttemptArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hour", models.DateTimeField(verbose_name="Час")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("success", "Успешно"), ("failed", "Не успешно")],
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество попыток"
+                    ),
+                ),
+                (
+                    "last_attempt_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Последняя попытка"
+                    ),
+                ),
+                (
+                    "mailing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_attempts",
+                        to="mailing.mailing",
+                        verbose_name="Рассылка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Архив попыток",
+                "verbose_name_plural": "Архив попыток",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("mailing", "hour", "status"),
+                        name="unique_attempt_archive",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:26
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнить в транзакции
+    atomic = False
+
+    dependencies = [
+        ("mailing", "0011_mailingattemptarchive"),
+        ("messaging", "0005_manager_search_indexes"),
+        ("recipients", "0005_manager_search_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="mailing",
+            index=models.Index(fields=["start_time"], name="mailing_start_time_idx"),
+        ),
+    ]
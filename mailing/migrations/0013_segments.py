@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0012_manager_search_indexes"),
+        ("recipients", "0007_segments"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="segment",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Клиенты сегмента определяются в момент отправки",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="mailings",
+                to="recipients.segment",
+                verbose_name="Сегмент",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="mailing",
+            name="recipients",
+            field=models.ManyToManyField(
+                blank=True, to="recipients.recipient", verbose_name="Получатели"
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнить в транзакции
+    atomic = False
+
+    dependencies = [
+        ("mailing", "0013_segments"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailingjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Последняя отметка обработчика"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="mailingjob",
+            index=models.Index(
+                condition=models.Q(("status", "running")),
+                fields=["heartbeat_at"],
+                name="job_running_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def close_duplicate_jobs(apps, schema_editor):
+    """
+    Оставляет у рассылки одно активное задание: выполняющееся, а если его
+    нет - самое раннее в очереди. Остальные отмечаются ошибкой
+    """
+    MailingJob = apps.get_model("mailing", "MailingJob")
+    active = MailingJob.objects.filter(status__in=["queued", "running"])
+    duplicated = (
+        active.values("mailing_id")
+        .annotate(count=models.Count("id"), first=Min("id"))
+        .filter(count__gt=1)
+    )
+    for row in duplicated:
+        jobs = active.filter(mailing_id=row["mailing_id"])
+        keep = jobs.filter(status="running").order_by("id").first() or jobs.get(
+            id=row["first"]
+        )
+        jobs.exclude(id=keep.id).update(
+            status="failed", error="Повторное задание той же рассылки"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0014_mailingjob_heartbeat"),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="mailingjob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["queued", "running"])),
+                fields=("mailing",),
+                name="unique_active_job",
+            ),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.db import models
 
+from recipients.models import Recipient
+
 
 class Mailing(models.Model):
     STATUS_CHOICES = [
@@ -20,13 +22,47 @@ class Mailing(models.Model):
         "messaging.Message", on_delete=models.CASCADE, verbose_name="Сообщение"
     )
     recipients = models.ManyToManyField(
-        "recipients.Recipient", verbose_name="Получатели"
+        "recipients.Recipient", blank=True, verbose_name="Получатели"
+    )
+    segment = models.ForeignKey(
+        "recipients.Segment",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="mailings",
+        verbose_name="Сегмент",
+        help_text="Клиенты сегмента определяются в момент отправки",
     )
 
+    def target_recipients(self):
+        """Получатели рассылки: выбранные вручную и клиенты сегмента"""
+        condition = models.Q(
+            pk__in=Mailing.recipients.through.objects.filter(mailing=self).values(
+                "recipient_id"
+            )
+        )
+        if self.segment_id:
+            condition |= models.Q(pk__in=self.segment.members().values("pk"))
+        return Recipient.objects.filter(condition)
+
     class Meta:
         permissions = [
             ("can_view_all_mailings", "Может просматривать все рассылки"),
         ]
+        indexes = [
+            # Рассылки владельца и их число по статусам
+            models.Index(fields=["owner", "status"], name="mailing_owner_status_idx"),
+            # Постраничный вывод рассылок владельца по курсору
+            models.Index(fields=["owner", "-id"], name="mailing_owner_pk_idx"),
+            # Отбор рассылок по дате начала в списке менеджера
+            models.Index(fields=["start_time"], name="mailing_start_time_idx"),
+            # Выбор рассылок к отправке: только еще не завершенные
+            models.Index(
+                fields=["start_time", "end_time"],
+                condition=models.Q(status__in=["created", "running"]),
+                name="mailing_active_window_idx",
+            ),
+        ]
         verbose_name = "Рассылка"
         verbose_name_plural = "Рассылки"
 
@@ -47,3 +83,227 @@ class MailingAttempt(models.Model):
         verbose_name="Рассылка",
         related_name="attempts",
     )
+
+    class Meta:
+        indexes = [
+            # Подсчет попыток рассылки по статусам
+            models.Index(
+                fields=["mailing", "status"], name="attempt_mailing_status_idx"
+            ),
+        ]
+
+
+class MailingStats(models.Model):
+    """
+    Счетчики попыток отправки рассылки. Обновляются вместе с записью
+    попыток (AttemptWriter), поэтому статистике не нужно читать MailingAttempt.
+    Пересчитываются с нуля командой rebuild_mailing_stats
+    """
+
+    mailing = models.OneToOneField(
+        "mailing.Mailing",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Рассылка",
+        related_name="counters",
+    )
+    total = models.PositiveIntegerField(default=0, verbose_name="Всего попыток")
+    success = models.PositiveIntegerField(default=0, verbose_name="Успешных")
+    failed = models.PositiveIntegerField(default=0, verbose_name="Неудачных")
+    last_attempt_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Последняя попытка"
+    )
+
+    class Meta:
+        verbose_name = "Статистика рассылки"
+        verbose_name_plural = "Статистика рассылок"
+
+
+class MailingAttemptRollup(models.Model):
+    """
+    Число попыток отправки рассылки с данным статусом за час или сутки.
+    Заполняется вместе с записью попыток (AttemptWriter), пересчитывается
+    командой rollup_attempts. По ней строятся графики динамики отправки
+    без чтения MailingAttempt
+    """
+
+    PERIOD_CHOICES = [
+        ("hour", "Час"),
+        ("day", "Сутки"),
+    ]
+    mailing = models.ForeignKey(
+        "mailing.Mailing",
+        on_delete=models.CASCADE,
+        verbose_name="Рассылка",
+        related_name="rollups",
+    )
+    period = models.CharField(
+        max_length=10, choices=PERIOD_CHOICES, verbose_name="Период"
+    )
+    bucket = models.DateTimeField(verbose_name="Начало периода")
+    status = models.CharField(
+        max_length=20, choices=MailingAttempt.STATUS_CHOICES, verbose_name="Статус"
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество попыток")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["mailing", "period", "bucket", "status"],
+                name="unique_attempt_rollup",
+            ),
+        ]
+        indexes = [
+            # Графики по всем рассылкам владельца или менеджера за период
+            models.Index(fields=["period", "bucket"], name="attempt_rollup_bucket_idx"),
+        ]
+        verbose_name = "Попытки за период"
+        verbose_name_plural = "Попытки за период"
+
+
+class MailingAttemptArchive(models.Model):
+    """
+    Попытки отправки, перенесенные из MailingAttempt командой
+    archive_attempts: число попыток рассылки с данным статусом за час.
+    Учитывается при пересчете MailingStats и MailingAttemptRollup
+    """
+
+    mailing = models.ForeignKey(
+        "mailing.Mailing",
+        on_delete=models.CASCADE,
+        verbose_name="Рассылка",
+        related_name="archived_attempts",
+    )
+    hour = models.DateTimeField(verbose_name="Час")
+    status = models.CharField(
+        max_length=20, choices=MailingAttempt.STATUS_CHOICES, verbose_name="Статус"
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество попыток")
+    last_attempt_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Последняя попытка"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["mailing", "hour", "status"], name="unique_attempt_archive"
+            ),
+        ]
+        verbose_name = "Архив попыток"
+        verbose_name_plural = "Архив попыток"
+
+
+class MailingJob(models.Model):
+    STATUS_CHOICES = [
+        ("queued", "В очереди"),
+        ("running", "Выполняется"),
+        ("done", "Завершена"),
+        ("failed", "Ошибка"),
+    ]
+    mailing = models.ForeignKey(
+        "mailing.Mailing",
+        on_delete=models.CASCADE,
+        verbose_name="Рассылка",
+        related_name="jobs",
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="queued", verbose_name="Статус"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Запущена")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Последняя отметка обработчика"
+    )
+    total = models.PositiveIntegerField(default=0, verbose_name="Всего получателей")
+    success_count = models.PositiveIntegerField(default=0, verbose_name="Успешно")
+    failed_count = models.PositiveIntegerField(default=0, verbose_name="Не успешно")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+
+    class Meta:
+        constraints = [
+            # Не больше одного задания в очереди или в работе на рассылку
+            models.UniqueConstraint(
+                fields=["mailing"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="unique_active_job",
+            ),
+        ]
+        indexes = [
+            # Очередь заданий: в индекс попадают только ожидающие задания
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(status="queued"),
+                name="job_queue_idx",
+            ),
+            # Поиск прерванных заданий: только выполняющиеся
+            models.Index(
+                fields=["heartbeat_at"],
+                condition=models.Q(status="running"),
+                name="job_running_idx",
+            ),
+        ]
+        verbose_name = "Задание на отправку"
+        verbose_name_plural = "Задания на отправку"
+
+    @property
+    def processed(self):
+        return self.success_count + self.failed_count
+
+    @property
+    def progress(self):
+        return round(self.processed / self.total * 100) if self.total else 0
+
+
+class MailingDelivery(models.Model):
+    """
+    Состояние доставки рассылки конкретному получателю (outbox).
+    По нему прерванная отправка продолжается с места остановки,
+    а временные ошибки отправляются повторно в next_attempt_at
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Ожидает отправки"),
+        ("sent", "Доставлено"),
+        ("retry", "Ожидает повтора"),
+        ("failed", "Ошибка"),
+    ]
+    mailing = models.ForeignKey(
+        "mailing.Mailing",
+        on_delete=models.CASCADE,
+        verbose_name="Рассылка",
+        related_name="deliveries",
+    )
+    recipient = models.ForeignKey(
+        "recipients.Recipient",
+        on_delete=models.CASCADE,
+        verbose_name="Получатель",
+        related_name="deliveries",
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending", verbose_name="Статус"
+    )
+    attempt_count = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Количество попыток"
+    )
+    next_attempt_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Следующая попытка"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["mailing", "recipient"], name="unique_mailing_recipient"
+            ),
+        ]
+        indexes = [
+            # Очередь повторов: в индекс попадают только строки в статусе retry
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status="retry"),
+                name="delivery_retry_due_idx",
+            ),
+        ]
+        verbose_name = "Доставка"
+        verbose_name_plural = "Доставки"
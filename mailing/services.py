@@ -1,12 +1,146 @@
-from django.core.mail import send_mail
+import gzip
+import json
+import time
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+from itertools import chain
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncDay, TruncHour
 from django.utils import timezone
 
-from mailing.models import Mailing, MailingAttempt
+from mailing.attempts import AttemptWriter, rollup_bucket
+from mailing.dashboard import ALL_OWNERS, get_dashboard, invalidate_dashboard
+from mailing.delivery import SMTPSession
+from mailing.models import (Mailing, MailingAttempt, MailingAttemptArchive,
+                            MailingAttemptRollup, MailingDelivery, MailingJob,
+                            MailingStats)
+from mailing.throttle import DailyLimitExceeded
+from messaging.templating import MessageTemplate
+from recipients.models import Recipient
+
+JOB_PROGRESS_INTERVAL = 1
+
+# На сколько откладывается выбранный повтор, пока обработчик его отправляет
+RETRY_LEASE = timedelta(minutes=5)
+
+# Сколько повторов обработчик забирает за раз: пачка должна уйти до
+# истечения RETRY_LEASE и при низкой скорости отправки (mailing.throttle),
+# и при медленном SMTP, иначе другой обработчик заберет ее повторно
+RETRY_CLAIM_SIZE = 10
+
+# До скольких суток график динамики отправки строится по часам
+TREND_HOURLY_DAYS = 2
+
+
+def keyset_chunks(queryset, chunk_size=None, key="pk"):
+    """
+    Читает queryset пачками по возрастанию key. Каждая пачка - отдельный
+    запрос WHERE key > последнее значение LIMIT chunk_size, поэтому память
+    не зависит от размера выборки, а запросы не замедляются как с OFFSET.
+    Queryset может быть values_list(key, flat=True)
+    """
+    chunk_size = chunk_size or settings.MAILING_CHUNK_SIZE
+    last = None
+    while True:
+        page = queryset.order_by(key)
+        if last is not None:
+            page = page.filter(**{f"{key}__gt": last})
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+        if isinstance(last, models.Model):
+            last = getattr(last, key)
+
+
+def prepare_outbox(mailing):
+    """
+    Создает записи доставки для получателей рассылки, у которых их еще нет.
+    Уже существующие записи (и их статус) не меняются. Клиенты сегмента
+    определяются здесь, в момент отправки, отдельным проходом по индексу;
+    получатель, попавший в оба списка, получает одну доставку
+    """
+    sources = [
+        (
+            Mailing.recipients.through.objects.filter(mailing=mailing).values_list(
+                "recipient_id", flat=True
+            ),
+            "recipient_id",
+        )
+    ]
+    if mailing.segment_id:
+        sources.append((mailing.segment.members().values_list("pk", flat=True), "pk"))
+
+    for recipient_ids, key in sources:
+        for chunk in keyset_chunks(recipient_ids, key=key):
+            MailingDelivery.objects.bulk_create(
+                [
+                    MailingDelivery(mailing=mailing, recipient_id=recipient_id)
+                    for recipient_id in chunk
+                ],
+                ignore_conflicts=True,
+            )
+
+
+DELIVERY_FIELDS = (
+    "mailing",
+    "status",
+    "attempt_count",
+    "recipient__email",
+    "recipient__full_name",
+)
+
+
+def pending_deliveries(mailing):
+    """
+    Доставки рассылки к отправке: новые и повторы, время которых подошло.
+    Загружаются только email и Ф.И.О. получателя
+    """
+    return (
+        mailing.deliveries.filter(
+            Q(status="pending") | Q(status="retry", next_attempt_at__lte=timezone.now())
+        )
+        .select_related("recipient")
+        .only(*DELIVERY_FIELDS)
+    )
+
+
+def iter_pending_deliveries(mailing, chunk_size=None):
+    """Потоково выдает невыполненные доставки, читая их пачками"""
+    for chunk in keyset_chunks(pending_deliveries(mailing), chunk_size):
+        yield from chunk
+
+
+def deliver(session, attempts, mailing, template, delivery):
+    """Отправляет письмо получателю доставки и записывает попытку"""
+    recipient = delivery.recipient
+    try:
+        subject, body = template.render(recipient)
+        session.send(EmailMessage(subject=subject, body=body, to=[recipient.email]))
+    except DailyLimitExceeded:
+        # Остальные получатели остаются в outbox до следующего запуска
+        raise
+    except Exception as e:
+        attempts.add(mailing, "failed", str(e)[:250], delivery=delivery, error=e)
+        return False
+
+    attempts.add(mailing, "success", "Успешно отправлено", delivery=delivery)
+    return True
 
 
-def send_mailing(mailing):
+def send_mailing(mailing, on_progress=None):
     """
-    Отправляет рассылку и создает записи о попытках отправки
+    Отправляет рассылку и создает записи о попытках отправки.
+    Получатели, которым письмо уже доставлено, пропускаются. Рассылка
+    завершается, только если не осталось доставок, ожидающих повтора,
+    иначе ее завершит send_due_retries().
+    on_progress(success, failed) вызывается после каждого получателя
     """
     success_count = 0
     failed_count = 0
@@ -14,66 +148,696 @@ def send_mailing(mailing):
     mailing.status = "running"
     mailing.save()
 
-    for recipient in mailing.recipients.all():
+    prepare_outbox(mailing)
+    template = MessageTemplate(mailing.message)
+
+    with SMTPSession() as session, AttemptWriter() as attempts:
+        for delivery in iter_pending_deliveries(mailing):
+            if deliver(session, attempts, mailing, template, delivery):
+                success_count += 1
+            else:
+                failed_count += 1
+
+            if on_progress:
+                on_progress(success_count, failed_count)
+
+    finish_mailing(mailing)
+
+    return {"success": success_count, "failed": failed_count}
+
+
+def finish_mailing(mailing):
+    """
+    Отмечает рассылку завершенной, если в outbox не осталось новых доставок
+    и доставок, ожидающих повтора. Доставки с постоянной ошибкой (failed)
+    завершению не мешают. Возвращает True, если рассылка завершена
+    """
+    if mailing.deliveries.filter(status__in=["pending", "retry"]).exists():
+        return False
+    mailing.status = "completed"
+    mailing.save(update_fields=["status"])
+    return True
+
+
+def send_due_retries(limit=None):
+    """
+    Повторно отправляет доставки всех рассылок, у которых подошло время
+    повтора, не больше limit за вызов. Доставки забираются небольшими
+    пачками через claim_due_retries(), результаты каждой пачки
+    записываются до того, как истечет ее RETRY_LEASE
+    """
+    limit = limit or settings.MAILING_CHUNK_SIZE
+    mailings = {}
+    templates = {}
+
+    success_count = 0
+    failed_count = 0
+    with SMTPSession() as session, AttemptWriter() as attempts:
+        while success_count + failed_count < limit:
+            deliveries = claim_due_retries(
+                min(RETRY_CLAIM_SIZE, limit - success_count - failed_count)
+            )
+            if not deliveries:
+                break
+
+            new = {delivery.mailing_id for delivery in deliveries} - mailings.keys()
+            mailings.update(Mailing.objects.select_related("message").in_bulk(new))
+            for pk in new:
+                templates[pk] = MessageTemplate(mailings[pk].message)
+
+            for delivery in deliveries:
+                mailing = mailings[delivery.mailing_id]
+                template = templates[delivery.mailing_id]
+                if deliver(session, attempts, mailing, template, delivery):
+                    success_count += 1
+                else:
+                    failed_count += 1
+            attempts.flush()
+
+    # Последний повтор рассылки завершает ее
+    for mailing in mailings.values():
+        if mailing.status == "running":
+            finish_mailing(mailing)
+
+    return {"success": success_count, "failed": failed_count}
+
+
+def claim_due_retries(limit):
+    """
+    Забирает до limit доставок, у которых подошло время повтора. Строки
+    выбираются по частичному индексу очереди повторов и блокируются
+    (SKIP LOCKED) с продлением next_attempt_at на RETRY_LEASE, чтобы
+    несколько обработчиков не отправили одно письмо дважды
+    """
+    now = timezone.now()
+    due = (
+        MailingDelivery.objects.filter(status="retry", next_attempt_at__lte=now)
+        .exclude(mailing__status="disabled")
+        .select_related("recipient")
+        .only(*DELIVERY_FIELDS)
+        .order_by("next_attempt_at")
+    )
+    with transaction.atomic():
+        deliveries = list(due.select_for_update(skip_locked=True, of=("self",))[:limit])
+        MailingDelivery.objects.filter(pk__in=[d.pk for d in deliveries]).update(
+            next_attempt_at=now + RETRY_LEASE
+        )
+    return deliveries
+
+
+def recipient_id_chunks(recipients, chunk_size):
+    """
+    id клиентов по возрастанию пачками по chunk_size. recipients - queryset
+    клиентов (читается пачками по pk) или набор id
+    """
+    if isinstance(recipients, models.QuerySet):
+        yield from keyset_chunks(recipients.values_list("pk", flat=True), chunk_size)
+        return
+    ids = sorted({int(pk) for pk in recipients})
+    for start in range(0, len(ids), chunk_size):
+        yield ids[start : start + chunk_size]
+
+
+def add_mailing_recipients(mailing, recipients, chunk_size=None):
+    """
+    Добавляет получателей рассылки пачками строк таблицы связи. Уже
+    добавленные пропускает сама база (ON CONFLICT DO NOTHING), без SELECT
+    существующих, как в recipients.add(). Все пачки - одна транзакция.
+    m2m_changed не отправляется. Возвращает число добавленных
+    """
+    chunk_size = chunk_size or settings.MAILING_CHUNK_SIZE
+    chunks = recipient_id_chunks(recipients, chunk_size)
+
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            return sum(insert_recipient_links(mailing, chunk) for chunk in chunks)
+
+        through = Mailing.recipients.through
+        links = through.objects.filter(mailing=mailing)
+        before = links.count()
+        for chunk in chunks:
+            through.objects.bulk_create(
+                [through(mailing_id=mailing.pk, recipient_id=pk) for pk in chunk],
+                ignore_conflicts=True,
+            )
+        return links.count() - before
+
+
+def insert_recipient_links(mailing, recipient_ids):
+    """
+    PostgreSQL: вставляет пачку строк таблицы связи одним запросом с
+    массивом id (без объектов модели) и возвращает число вставленных
+    """
+    table = connection.ops.quote_name(Mailing.recipients.through._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (mailing_id, recipient_id) "
+            "SELECT %s, unnest(%s::bigint[]) ON CONFLICT DO NOTHING",
+            [mailing.pk, recipient_ids],
+        )
+        return cursor.rowcount
+
+
+def remove_mailing_recipients(mailing, recipients, chunk_size=None):
+    """
+    Убирает получателей рассылки пачками через delete_recipient_links().
+    Все пачки - одна транзакция. Возвращает число удаленных
+    """
+    chunk_size = chunk_size or settings.MAILING_CHUNK_SIZE
+    with transaction.atomic():
+        return sum(
+            delete_recipient_links(mailing, chunk)
+            for chunk in recipient_id_chunks(recipients, chunk_size)
+        )
+
+
+def delete_recipient_links(mailing, recipient_ids):
+    """
+    Удаляет пачку строк таблицы связи по id клиентов (по возрастанию) и
+    возвращает число удаленных. В PostgreSQL - один DELETE с массивом id
+    (= ANY), без разбора тысячи параметров IN; иначе DELETE по диапазону
+    recipient_id пачки с уточнением IN
+    """
+    if not recipient_ids:
+        return 0
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(Mailing.recipients.through._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} "
+                "WHERE mailing_id = %s AND recipient_id = ANY(%s::bigint[])",
+                [mailing.pk, recipient_ids],
+            )
+            return cursor.rowcount
+
+    deleted, _ = Mailing.recipients.through.objects.filter(
+        mailing=mailing,
+        recipient_id__gte=recipient_ids[0],
+        recipient_id__lte=recipient_ids[-1],
+        recipient_id__in=recipient_ids,
+    ).delete()
+    return deleted
+
+
+def clear_mailing_recipients(mailing):
+    """
+    Убирает всех получателей рассылки одним DELETE по индексу mailing_id:
+    в одной транзакции пачки не уменьшают ни блокировки, ни журнал, а
+    только добавляют запросы. Возвращает число удаленных
+    """
+    removed, _ = Mailing.recipients.through.objects.filter(mailing=mailing).delete()
+    return removed
+
+
+def set_mailing_recipients(mailing, recipients, chunk_size=None):
+    """
+    Заменяет получателей рассылки на recipients (queryset клиентов или набор
+    id). Текущие получатели читаются пачками по recipient_id, в каждой пачке
+    удаляются те, кого нет среди recipients; затем недостающие добавляются
+    пачками через add_mailing_recipients(). Все пачки - одна транзакция.
+    Возвращает (добавлено, удалено)
+    """
+    links = Mailing.recipients.through.objects.filter(mailing=mailing)
+    if isinstance(recipients, models.QuerySet):
+        keep = recipients.values("pk")
+    else:
+        recipients = {int(pk) for pk in recipients}
+
+    removed = 0
+    with transaction.atomic():
+        recipient_ids = links.values_list("recipient_id", flat=True)
+        for chunk in keyset_chunks(recipient_ids, chunk_size, key="recipient_id"):
+            if isinstance(recipients, models.QuerySet):
+                deleted, _ = (
+                    links.filter(
+                        recipient_id__gte=chunk[0], recipient_id__lte=chunk[-1]
+                    )
+                    .exclude(recipient_id__in=keep)
+                    .delete()
+                )
+                removed += deleted
+            else:
+                removed += delete_recipient_links(
+                    mailing, [pk for pk in chunk if pk not in recipients]
+                )
+        added = add_mailing_recipients(mailing, recipients, chunk_size)
+    return added, removed
+
+
+def enqueue_mailing(mailing):
+    """
+    Ставит рассылку в очередь run_mail_worker. Если рассылка уже в очереди
+    или отправляется, новое задание не создается: второе активное задание
+    не даст создать ограничение unique_active_job, даже если два запроса
+    ставят рассылку в очередь одновременно.
+    Возвращает задание и признак того, что оно создано
+    """
+    active = mailing.jobs.filter(status__in=["queued", "running"])
+    while True:
+        job = active.first()
+        if job:
+            return job, False
         try:
-            send_mail(
-                subject=mailing.message.topic_message,
-                message=mailing.message.text_message,
-                from_email=None,
-                recipient_list=[recipient.email],
-                fail_silently=False,
+            with transaction.atomic():
+                return MailingJob.objects.create(mailing=mailing), True
+        except IntegrityError:
+            # Задание только что создал другой запрос - вернуть его
+            continue
+
+
+def requeue_stale_jobs():
+    """
+    Возвращает в очередь задания, которые числятся выполняющимися, но
+    обработчик не отмечался в них дольше MAILING_JOB_STALE_TIMEOUT секунд:
+    процесс был убит и задание уже никто не завершит. Отправка продолжится
+    по outbox, получатели с доставленным письмом пропускаются.
+    Возвращает число возвращенных заданий
+    """
+    stale_before = timezone.now() - timedelta(
+        seconds=settings.MAILING_JOB_STALE_TIMEOUT
+    )
+    with transaction.atomic():
+        stale = list(
+            MailingJob.objects.select_for_update(skip_locked=True)
+            .filter(status="running")
+            .filter(
+                Q(heartbeat_at__lt=stale_before)
+                | Q(heartbeat_at__isnull=True, started_at__lt=stale_before)
             )
+            .values_list("pk", flat=True)
+        )
+        return MailingJob.objects.filter(pk__in=stale).update(
+            status="queued", heartbeat_at=None
+        )
+
+
+def run_mailing_job(job):
+    """
+    Выполняет задание на отправку рассылки, сохраняя прогресс и отметку
+    обработчика (heartbeat_at) не чаще раза в JOB_PROGRESS_INTERVAL секунд
+    """
+    last_saved = time.monotonic()
+
+    def save_progress(success, failed):
+        nonlocal last_saved
+        job.success_count = success
+        job.failed_count = failed
+        if time.monotonic() - last_saved < JOB_PROGRESS_INTERVAL:
+            return
+        MailingJob.objects.filter(pk=job.pk).update(
+            success_count=success, failed_count=failed, heartbeat_at=timezone.now()
+        )
+        last_saved = time.monotonic()
+
+    mailing = job.mailing
+    job.total = (
+        mailing.target_recipients().count()
+        - mailing.deliveries.filter(status="sent").count()
+    )
+    job.heartbeat_at = timezone.now()
+    job.save(update_fields=["total", "heartbeat_at"])
 
-            MailingAttempt.objects.create(
-                datetime_attempt=timezone.now(),
-                status="success",
-                mail_server_response="Успешно отправлено",
-                mailing=mailing,
+    try:
+        results = send_mailing(mailing, on_progress=save_progress)
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)[:250]
+    else:
+        job.status = "done"
+        job.success_count = results["success"]
+        job.failed_count = results["failed"]
+
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def annotate_statistics(queryset):
+    """
+    Добавляет к рассылкам число попыток отправки: всего (total_attempts),
+    успешных (successful_attempts), неудачных (failed_attempts) и время
+    последней попытки (last_attempt_at).
+    Значения берутся из счетчиков MailingStats тем же запросом, что и
+    сами рассылки, таблица попыток при этом не читается
+    """
+    return queryset.annotate(
+        total_attempts=Coalesce("counters__total", 0),
+        successful_attempts=Coalesce("counters__success", 0),
+        failed_attempts=Coalesce("counters__failed", 0),
+        last_attempt_at=F("counters__last_attempt_at"),
+    )
+
+
+def related_count(queryset, field):
+    """
+    Число строк queryset, ссылающихся полем field на строку внешнего запроса.
+    Коррелированный подзапрос вместо Count() по JOIN: несколько счетчиков
+    в одном списке не перемножают строки и не требуют GROUP BY всей таблицы
+    """
+    counts = (
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def rebuild_mailing_stats(mailings=None):
+    """
+    Пересчитывает счетчики MailingStats по таблице попыток и архиву для
+    указанных рассылок (по умолчанию всех).
+    Возвращает число пересчитанных рассылок
+    """
+    mailings = Mailing.objects.all() if mailings is None else mailings
+    count = 0
+    for chunk in keyset_chunks(mailings.values_list("pk", flat=True)):
+        attempts = (
+            MailingAttempt.objects.filter(mailing__in=chunk)
+            .values("mailing")
+            .annotate(
+                total=Count("id"),
+                success=Count("id", filter=Q(status="success")),
+                failed=Count("id", filter=Q(status="failed")),
+                last_attempt_at=Max("datetime_attempt"),
+            )
+            .order_by()
+        )
+        archived = (
+            MailingAttemptArchive.objects.filter(mailing__in=chunk)
+            .values("mailing")
+            .annotate(
+                total=Sum("count"),
+                success=Sum("count", filter=Q(status="success"), default=0),
+                failed=Sum("count", filter=Q(status="failed"), default=0),
+                last_attempt_at=Max("last_attempt_at"),
+            )
+            .order_by()
+        )
+        counters = {}
+        for row in chain(attempts, archived):
+            counter = counters.setdefault(
+                row["mailing"],
+                {"total": 0, "success": 0, "failed": 0, "last_attempt_at": None},
             )
-            success_count += 1
-
-        except Exception as e:
-            MailingAttempt.objects.create(
-                datetime_attempt=timezone.now(),
-                status="failed",
-                mail_server_response=str(e)[:250],
-                mailing=mailing,
+            for field in ("total", "success", "failed"):
+                counter[field] += row[field]
+            counter["last_attempt_at"] = max(
+                filter(None, [counter["last_attempt_at"], row["last_attempt_at"]]),
+                default=None,
             )
-            failed_count += 1
+        MailingStats.objects.bulk_create(
+            [MailingStats(mailing_id=pk, **counters.get(pk, {})) for pk in chunk],
+            update_conflicts=True,
+            unique_fields=["mailing"],
+            update_fields=["total", "success", "failed", "last_attempt_at"],
+        )
+        invalidate_dashboard(
+            Mailing.objects.filter(pk__in=chunk)
+            .values_list("owner_id", flat=True)
+            .distinct()
+        )
+        count += len(chunk)
+    return count
 
-    mailing.status = "completed"
-    mailing.save()
 
-    return {"success": success_count, "failed": failed_count}
+def success_rate(successful, total):
+    """Доля успешных попыток в процентах"""
+    return (successful / total * 100) if total > 0 else 0
+
+
+def mailing_statistics(mailing):
+    """Статистика рассылки из annotate_statistics() для шаблонов"""
+    return {
+        "total": mailing.total_attempts,
+        "successful": mailing.successful_attempts,
+        "failed": mailing.failed_attempts,
+        "last_attempt_at": mailing.last_attempt_at,
+        "success": round(
+            success_rate(mailing.successful_attempts, mailing.total_attempts), 2
+        ),
+    }
+
+
+def get_dashboard_statistics(user):
+    """
+    Статистика рассылок пользователя (менеджеру - всех рассылок) для
+    страницы статистики. Берется из кэша, см. mailing.dashboard
+    """
+    is_manager = hasattr(user, "role") and user.role == "manager"
+    mailings = Mailing.objects.select_related("message")
+    recipients = Recipient.objects.all()
+    if not is_manager:
+        mailings = mailings.filter(owner=user)
+        recipients = recipients.filter(owner=user)
+
+    def compute():
+        mailing_list = list(annotate_statistics(mailings))
+        for mailing in mailing_list:
+            mailing.stats = mailing_statistics(mailing)
+        return {
+            "mailings": mailing_list,
+            "total_mailings": len(mailing_list),
+            "active_mailings": sum(m.status == "running" for m in mailing_list),
+            "unique_clients": recipients.count(),
+        }
+
+    return get_dashboard(ALL_OWNERS if is_manager else user.pk, compute)
 
 
 def get_all_mailings_statistics():
     """
     Получает статистику по всем рассылкам
     """
-    mailings = Mailing.objects.all()
-    statistics = []
+    return [
+        {
+            "mailing": mailing,
+            "stats": {
+                "total": mailing.total_attempts,
+                "success": mailing.successful_attempts,
+                "failed": mailing.failed_attempts,
+                "success_rate": success_rate(
+                    mailing.successful_attempts, mailing.total_attempts
+                ),
+            },
+        }
+        for mailing in annotate_statistics(Mailing.objects.all())
+    ]
+
+
+def rebuild_attempt_rollups(since=None):
+    """
+    Пересчитывает MailingAttemptRollup по таблице попыток и архиву начиная
+    с суток, в которые попадает since (по умолчанию за все время).
+    Возвращает число записанных счетчиков
+    """
+    attempts = MailingAttempt.objects.all()
+    archived = MailingAttemptArchive.objects.all()
+    rollups = MailingAttemptRollup.objects.all()
+    if since is not None:
+        since = rollup_bucket(since, "day")
+        attempts = attempts.filter(datetime_attempt__gte=since)
+        archived = archived.filter(hour__gte=since)
+        rollups = rollups.filter(bucket__gte=since)
+
+    count = 0
+    with transaction.atomic():
+        rollups.delete()
+        for period, trunc in (("hour", TruncHour), ("day", TruncDay)):
+            rows = chain(
+                attempts.annotate(bucket=trunc("datetime_attempt"))
+                .values("mailing_id", "bucket", "status")
+                .annotate(count=Count("id"))
+                .order_by()
+                .iterator(),
+                archived.annotate(bucket=trunc("hour"))
+                .values("mailing_id", "bucket", "status")
+                .annotate(count=Sum("count"))
+                .order_by()
+                .iterator(),
+            )
+            # Час может быть частично в архиве и частично в таблице попыток
+            counters = {}
+            for row in rows:
+                key = (row["mailing_id"], row["bucket"], row["status"])
+                counters[key] = counters.get(key, 0) + row["count"]
+
+            count += len(
+                MailingAttemptRollup.objects.bulk_create(
+                    [
+                        MailingAttemptRollup(
+                            mailing_id=mailing_id,
+                            period=period,
+                            bucket=bucket,
+                            status=status,
+                            count=total,
+                        )
+                        for (mailing_id, bucket, status), total in counters.items()
+                    ],
+                    batch_size=settings.MAILING_CHUNK_SIZE,
+                )
+            )
+    return count
 
-    for mailing in mailings:
-        attempts = mailing.attempts.all()
-        total_attempts = attempts.count()
-        successful_attempts = attempts.filter(status="success").count()
-        failed_attempts = attempts.filter(status="failed").count()
 
-        statistics.append(
+def archive_attempts(before, batch_size=None, export_dir=None):
+    """
+    Переносит попытки отправки раньше before (с точностью до часа) в
+    MailingAttemptArchive пачками по batch_size, каждая пачка - отдельная
+    транзакция. Счетчики MailingStats и MailingAttemptRollup не меняются.
+
+    Если указан export_dir, сами попытки дописываются в файл
+    attempts-<время запуска>.jsonl.gz в этой папке до их удаления из
+    таблицы. Если удаление пачки не удалось, при повторном запуске эти
+    попытки попадут в файл еще раз.
+    Возвращает число перенесенных попыток
+    """
+    before = rollup_bucket(before, "hour")
+    batch_size = batch_size or settings.MAILING_CHUNK_SIZE
+    export_path = None
+    if export_dir:
+        export_path = (
+            Path(export_dir) / f"attempts-{timezone.now():%Y%m%d%H%M%S}.jsonl.gz"
+        )
+
+    archived = 0
+    last = 0
+    while True:
+        with transaction.atomic():
+            attempts = list(
+                MailingAttempt.objects.filter(pk__gt=last, datetime_attempt__lt=before)
+                .order_by("pk")
+                .select_for_update(skip_locked=True)[:batch_size]
+            )
+            if not attempts:
+                break
+            if export_path:
+                export_attempts(export_path, attempts)
+            archive_attempt_rows(attempts)
+            MailingAttempt.objects.filter(pk__in=[a.pk for a in attempts]).delete()
+        archived += len(attempts)
+        last = attempts[-1].pk
+    return archived
+
+
+def export_attempts(path, attempts):
+    """Дописывает попытки в файл JSON Lines, сжатый gzip"""
+    with gzip.open(path, "at", encoding="utf-8") as file:
+        for attempt in attempts:
+            file.write(
+                json.dumps(
+                    {
+                        "id": attempt.pk,
+                        "mailing_id": attempt.mailing_id,
+                        "datetime_attempt": attempt.datetime_attempt.isoformat(),
+                        "status": attempt.status,
+                        "mail_server_response": attempt.mail_server_response,
+                    },
+                    ensure_ascii=False,
+                )
+                + "\n"
+            )
+
+
+def archive_attempt_rows(attempts):
+    """
+    Добавляет попытки к почасовым счетчикам архива: недостающие строки
+    создаются, затем счетчики увеличиваются через F-выражения
+    """
+    counters = {}
+    for attempt in attempts:
+        key = (
+            attempt.mailing_id,
+            rollup_bucket(attempt.datetime_attempt, "hour"),
+            attempt.status,
+        )
+        count, last = counters.get(key, (0, attempt.datetime_attempt))
+        counters[key] = (count + 1, max(last, attempt.datetime_attempt))
+
+    MailingAttemptArchive.objects.bulk_create(
+        [
+            MailingAttemptArchive(mailing_id=mailing_id, hour=hour, status=status)
+            for mailing_id, hour, status in counters
+        ],
+        ignore_conflicts=True,
+    )
+    for (mailing_id, hour, status), (count, last) in counters.items():
+        MailingAttemptArchive.objects.filter(
+            mailing_id=mailing_id, hour=hour, status=status
+        ).update(
+            count=F("count") + count,
+            last_attempt_at=Greatest(
+                Coalesce("last_attempt_at", Value(last)), Value(last)
+            ),
+        )
+
+
+def rollup_buckets(since, until, period):
+    """Начала всех часов или суток от since до until включительно"""
+    if period == "hour":
+        # Часы перебираются в UTC, чтобы переход на летнее время не давал
+        # пропущенных и повторяющихся часов
+        current, step = since.astimezone(dt_timezone.utc), timedelta(hours=1)
+    else:
+        current, step = timezone.localtime(since), timedelta(days=1)
+    while current <= until:
+        yield current
+        current += step
+
+
+def get_attempt_trends(user, days, mailing_id=None):
+    """
+    Число успешных и неудачных попыток отправки по часам (за период до
+    TREND_HOURLY_DAYS суток) или по суткам за последние days суток.
+    Считается по MailingAttemptRollup, поэтому время зависит только от
+    числа точек графика, а не от числа попыток
+    """
+    period = "hour" if days <= TREND_HOURLY_DAYS else "day"
+    now = timezone.now()
+    if period == "hour":
+        since = rollup_bucket(now - timedelta(days=days) + timedelta(hours=1), period)
+    else:
+        since = rollup_bucket(now - timedelta(days=days - 1), period)
+
+    rollups = MailingAttemptRollup.objects.filter(period=period, bucket__gte=since)
+    if not (hasattr(user, "role") and user.role == "manager"):
+        rollups = rollups.filter(mailing__owner=user)
+    if mailing_id:
+        rollups = rollups.filter(mailing_id=mailing_id)
+
+    rows = {
+        row["bucket"]: row
+        for row in rollups.values("bucket")
+        .annotate(
+            success=Sum("count", filter=Q(status="success"), default=0),
+            failed=Sum("count", filter=Q(status="failed"), default=0),
+        )
+        .order_by("bucket")
+    }
+
+    points = []
+    for bucket in rollup_buckets(since, now, period):
+        row = rows.get(bucket, {"success": 0, "failed": 0})
+        total = row["success"] + row["failed"]
+        points.append(
             {
-                "mailing": mailing,
-                "stats": {
-                    "total": total_attempts,
-                    "success": successful_attempts,
-                    "failed": failed_attempts,
-                    "success_rate": (
-                        (successful_attempts / total_attempts * 100)
-                        if total_attempts > 0
-                        else 0
-                    ),
-                },
+                "bucket": bucket,
+                "success": row["success"],
+                "failed": row["failed"],
+                "total": total,
+                "failure_rate": round(row["failed"] / total * 100, 2) if total else 0,
             }
         )
 
-    return statistics
+    peak = max((point["total"] for point in points), default=0)
+    for point in points:
+        point["success_width"] = point["success"] / peak * 100 if peak else 0
+        point["failed_width"] = point["failed"] / peak * 100 if peak else 0
+
+    return {
+        "period": period,
+        "points": points,
+        "success": sum(point["success"] for point in points),
+        "failed": sum(point["failed"] for point in points),
+    }
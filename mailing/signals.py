@@ -0,0 +1,47 @@
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from mailing.dashboard import invalidate_dashboard
+from mailing.models import Mailing
+from messaging.models import Message
+from recipients.models import Recipient
+
+# Канал PostgreSQL LISTEN/NOTIFY, по которому планировщик (run_scheduler)
+# узнает об изменении расписания рассылок
+SCHEDULE_CHANNEL = "mailing_schedule"
+
+
+def notify_schedule_change(mailing_id):
+    """
+    Сообщает планировщику об изменении рассылки. PostgreSQL доставляет
+    уведомление только после фиксации транзакции, в которой оно отправлено
+    """
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [SCHEDULE_CHANNEL, str(mailing_id)])
+
+
+@receiver(post_save, sender=Mailing)
+def mailing_saved(sender, instance, **kwargs):
+    notify_schedule_change(instance.pk)
+    invalidate_dashboard([instance.owner_id])
+
+
+@receiver(post_delete, sender=Mailing)
+def mailing_deleted(sender, instance, **kwargs):
+    notify_schedule_change(instance.pk)
+    invalidate_dashboard([instance.owner_id])
+
+
+@receiver(post_save, sender=Recipient)
+@receiver(post_delete, sender=Recipient)
+def recipient_changed(sender, instance, **kwargs):
+    invalidate_dashboard([instance.owner_id])
+
+
+@receiver(post_save, sender=Message)
+def message_saved(sender, instance, **kwargs):
+    # Тема сообщения выводится в статистике рассылок
+    invalidate_dashboard([instance.owner_id])
@@ -0,0 +1,1245 @@
+import base64
+import csv
+import gzip
+import io
+import json
+import re
+import smtplib
+import tempfile
+import unittest
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+import redis
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import QuerySet, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+from mailing.attempts import (AttemptWriter, retry_delay, rollup_bucket,
+                              schedule_retry, update_attempt_rollups,
+                              update_mailing_stats)
+from mailing.dashboard import (KEY_PREFIX, get_dashboard, get_version,
+                               invalidate_dashboard)
+from mailing.delivery import SMTPSession, is_transient
+from mailing.management.commands.run_scheduler import Command as Scheduler
+from mailing.models import (Mailing, MailingAttempt, MailingAttemptRollup,
+                            MailingDelivery, MailingJob, MailingStats)
+from mailing.services import (add_mailing_recipients, archive_attempts,
+                              clear_mailing_recipients, enqueue_mailing,
+                              get_attempt_trends, iter_pending_deliveries,
+                              keyset_chunks, prepare_outbox,
+                              rebuild_attempt_rollups, rebuild_mailing_stats,
+                              remove_mailing_recipients, requeue_stale_jobs,
+                              send_due_retries, send_mailing,
+                              set_mailing_recipients)
+from mailing.throttle import RateLimiter, get_rate_limiter
+from messaging.models import Message
+from recipients.models import Recipient, Segment, Tag
+from testing import QueryBudgetMixin
+from users.models import User
+
+
+def create_mailing(owner, recipients=0, **fields):
+    """Рассылка владельца owner на recipients новых клиентов"""
+    now = timezone.now()
+    fields.setdefault("start_time", now)
+    fields.setdefault("end_time", now + timedelta(days=1))
+    mailing = Mailing.objects.create(
+        owner=owner,
+        message=Message.objects.create(
+            owner=owner, topic_message="Тема", text_message="Текст"
+        ),
+        **fields,
+    )
+    mailing.recipients.set(
+        Recipient.objects.create(
+            owner=owner,
+            email=f"client{number}-{mailing.pk}@example.com",
+            full_name=f"Клиент {number}",
+        )
+        for number in range(recipients)
+    )
+    return mailing
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class ListQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Число запросов списков не зависит от числа строк на странице"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        self.manager = User.objects.create_user(
+            email="manager@example.com", role=User.Role.MANAGER
+        )
+        self.rows = 0
+
+    def add_mailings(self, count):
+        now = timezone.now()
+        for _ in range(count):
+            self.rows += 1
+            owner = User.objects.create_user(email=f"user{self.rows}@example.com")
+            message = Message.objects.create(
+                owner=owner, topic_message=f"Тема {self.rows}", text_message="Текст"
+            )
+            for mailing_owner in (owner, self.owner):
+                Mailing.objects.create(
+                    owner=mailing_owner,
+                    message=message,
+                    start_time=now,
+                    end_time=now + timedelta(days=1),
+                )
+
+    def add_recipients(self, count):
+        for _ in range(count):
+            self.rows += 1
+            owner = User.objects.create_user(email=f"user{self.rows}@example.com")
+            Recipient.objects.create(
+                owner=owner,
+                email=f"recipient{self.rows}@example.com",
+                full_name=f"Клиент {self.rows}",
+            )
+
+    def test_mailing_list(self):
+        self.add_mailings(1)
+        self.client.force_login(self.owner)
+        url = reverse("mailing:mailings_list")
+
+        with self.assertQueryBudget(4):
+            self.client.get(url)
+        self.assertConstantQueries(lambda: self.client.get(url), self.add_mailings)
+
+    def test_statistics(self):
+        self.add_mailings(1)
+        self.client.force_login(self.owner)
+        url = reverse("users:statistics")
+
+        def run():
+            cache.clear()
+            self.client.get(url)
+
+        self.assertConstantQueries(run, self.add_mailings)
+
+    def test_manager_user_list(self):
+        self.add_mailings(1)
+        self.client.force_login(self.manager)
+        url = reverse("mailing:manager_users")
+        self.assertConstantQueries(lambda: self.client.get(url), self.add_mailings)
+
+    def test_manager_mailing_list(self):
+        self.add_mailings(1)
+        self.client.force_login(self.manager)
+        url = reverse("mailing:manager_mailings")
+        self.assertConstantQueries(lambda: self.client.get(url), self.add_mailings)
+
+    def test_manager_recipient_list(self):
+        self.add_recipients(1)
+        self.client.force_login(self.manager)
+        url = reverse("mailing:manager_recipients")
+        self.assertConstantQueries(lambda: self.client.get(url), self.add_recipients)
+
+
+class ManagerFilterTest(TestCase):
+    """Поиск и фильтры списков менеджера"""
+
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            email="manager@example.com", role=User.Role.MANAGER
+        )
+        self.alice = User.objects.create_user(
+            email="alice@example.com", first_name="Алиса"
+        )
+        self.bob = User.objects.create_user(email="bob@example.com", is_blocked=True)
+        now = timezone.now()
+        for owner, topic, days in ((self.alice, "Акция", 0), (self.bob, "Новости", 10)):
+            message = Message.objects.create(
+                owner=owner, topic_message=topic, text_message="Текст"
+            )
+            mailing = Mailing.objects.create(
+                owner=owner,
+                message=message,
+                start_time=now - timedelta(days=days),
+                end_time=now + timedelta(days=1),
+            )
+            recipient = Recipient.objects.create(
+                owner=owner, email=f"client-{owner.pk}@example.com", full_name=topic
+            )
+            mailing.recipients.add(recipient)
+        self.client.force_login(self.manager)
+
+    def get_list(self, name, **params):
+        response = self.client.get(reverse(f"mailing:{name}"), params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context["object_list"])
+
+    def test_user_search_and_counts(self):
+        users = self.get_list("manager_users", q="Алис")
+        self.assertEqual(users, [self.alice])
+        self.assertEqual(users[0].mailings_count, 1)
+        self.assertEqual(users[0].recipients_count, 1)
+        self.assertEqual(self.get_list("manager_users", is_blocked="1"), [self.bob])
+        self.assertEqual(
+            self.get_list("manager_users", role=User.Role.MANAGER), [self.manager]
+        )
+
+    def test_mailing_filters(self):
+        today = timezone.localdate()
+        mailings = self.get_list("manager_mailings", date_from=today.isoformat())
+        self.assertEqual([m.owner for m in mailings], [self.alice])
+        self.assertEqual(mailings[0].recipients_count, 1)
+        mailings = self.get_list("manager_mailings", owner="BOB@example.com")
+        self.assertEqual([m.owner for m in mailings], [self.bob])
+        mailings = self.get_list("manager_mailings", q="Новост")
+        self.assertEqual([m.owner for m in mailings], [self.bob])
+
+    def test_recipient_search(self):
+        recipients = self.get_list("manager_recipients", q="CLIENT-")
+        self.assertEqual(len(recipients), 2)
+        recipients = self.get_list("manager_recipients", q="Акц")
+        self.assertEqual([r.owner for r in recipients], [self.alice])
+        self.assertEqual(recipients[0].mailings_count, 1)
+
+    def test_invalid_filter_shows_everything(self):
+        self.assertEqual(
+            len(self.get_list("manager_mailings", date_from="not-a-date")), 2
+        )
+
+    def test_toggle_requires_post(self):
+        url = reverse("mailing:toggle_user_block", args=[self.alice.pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.client.post(url)
+        self.alice.refresh_from_db()
+        self.assertTrue(self.alice.is_blocked)
+
+
+class SegmentTargetingTest(TestCase):
+    """Получатели из сегмента определяются при отправке"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        other = User.objects.create_user(email="other@example.com")
+        self.vip = Tag.objects.create(owner=self.owner, name="vip")
+        self.recipients = []
+        for number, tags in enumerate(([self.vip], [], [self.vip])):
+            recipient = Recipient.objects.create(
+                owner=self.owner,
+                email=f"client{number}@example.com",
+                full_name=f"Клиент {number}",
+            )
+            recipient.tags.set(tags)
+            self.recipients.append(recipient)
+        Recipient.objects.create(
+            owner=other, email="foreign@example.com", full_name="Чужой"
+        )
+
+        now = timezone.now()
+        self.segment = Segment.objects.create(owner=self.owner, name="VIP")
+        self.segment.tags.add(self.vip)
+        self.mailing = Mailing.objects.create(
+            owner=self.owner,
+            message=Message.objects.create(
+                owner=self.owner, topic_message="Тема", text_message="Текст"
+            ),
+            start_time=now,
+            end_time=now + timedelta(days=1),
+            segment=self.segment,
+        )
+
+    def delivered_to(self):
+        prepare_outbox(self.mailing)
+        return set(self.mailing.deliveries.values_list("recipient_id", flat=True))
+
+    def test_tagged_members_and_explicit_recipients(self):
+        first, untagged, third = self.recipients
+        self.mailing.recipients.add(first, untagged)
+        self.assertEqual(self.delivered_to(), {first.pk, untagged.pk, third.pk})
+        self.assertEqual(self.mailing.target_recipients().count(), 3)
+
+    def test_membership_is_resolved_at_send_time(self):
+        self.assertEqual(len(self.delivered_to()), 2)
+        self.recipients[1].tags.add(self.vip)
+        self.assertEqual(len(self.delivered_to()), 3)
+
+    def test_segment_without_tags_is_all_owner_recipients(self):
+        self.segment.tags.clear()
+        self.assertEqual(self.delivered_to(), {r.pk for r in self.recipients})
+
+    def test_form_renders_only_chosen_recipients(self):
+        self.mailing.recipients.add(self.recipients[0])
+        self.client.force_login(self.owner)
+        response = self.client.get(
+            reverse("mailing:mailing_edit", args=[self.mailing.pk])
+        )
+        html = response.content.decode()
+        self.assertIn("client0@example.com", html)
+        self.assertNotIn("client1@example.com", html)
+        self.assertIn(reverse("recipients:recipient_autocomplete"), html)
+
+    def test_form_rejects_foreign_recipient(self):
+        foreign = Recipient.objects.get(email="foreign@example.com")
+        self.client.force_login(self.owner)
+        now = timezone.now()
+        response = self.client.post(
+            reverse("mailing:mailing_form"),
+            {
+                "start_time": now.strftime("%Y-%m-%d %H:%M"),
+                "end_time": (now + timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+                "message": self.mailing.message_id,
+                "recipients": [self.recipients[0].pk, foreign.pk],
+            },
+        )
+        self.assertIn("recipients", response.context["form"].errors)
+
+    def test_form_requires_recipients_or_segment(self):
+        self.client.force_login(self.owner)
+        now = timezone.now()
+        response = self.client.post(
+            reverse("mailing:mailing_form"),
+            {
+                "start_time": now.strftime("%Y-%m-%d %H:%M"),
+                "end_time": (now + timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+                "message": self.mailing.message_id,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].non_field_errors())
+
+
+class MailingRecipientsApiTest(TestCase):
+    """Добавление и удаление получателей рассылки пачками"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        self.ids = [
+            Recipient.objects.create(
+                owner=self.owner,
+                email=f"client{number}@example.com",
+                full_name=f"Клиент {number}",
+            ).pk
+            for number in range(7)
+        ]
+        now = timezone.now()
+        self.mailing = Mailing.objects.create(
+            owner=self.owner,
+            message=Message.objects.create(
+                owner=self.owner, topic_message="Тема", text_message="Текст"
+            ),
+            start_time=now,
+            end_time=now + timedelta(days=1),
+        )
+
+    def members(self):
+        return set(self.mailing.recipients.values_list("pk", flat=True))
+
+    def test_add_remove_clear(self):
+        self.assertEqual(add_mailing_recipients(self.mailing, self.ids[:4], 3), 4)
+        self.assertEqual(
+            add_mailing_recipients(
+                self.mailing, Recipient.objects.filter(owner=self.owner), 3
+            ),
+            3,
+        )
+        self.assertEqual(self.members(), set(self.ids))
+
+        removed = remove_mailing_recipients(self.mailing, self.ids[::2], 2)
+        self.assertEqual(removed, 4)
+        self.assertEqual(self.members(), set(self.ids[1::2]))
+
+        self.assertEqual(clear_mailing_recipients(self.mailing), 3)
+        self.assertEqual(self.members(), set())
+
+    def test_set(self):
+        add_mailing_recipients(self.mailing, self.ids[:4])
+        added, removed = set_mailing_recipients(self.mailing, self.ids[2:], 2)
+        self.assertEqual((added, removed), (3, 2))
+        self.assertEqual(self.members(), set(self.ids[2:]))
+
+    def test_set_from_queryset(self):
+        add_mailing_recipients(self.mailing, self.ids[::2])
+        chosen = Recipient.objects.filter(pk__in=self.ids[:3])
+        added, removed = set_mailing_recipients(self.mailing, chosen, 2)
+        self.assertEqual((added, removed), (1, 2))
+        self.assertEqual(self.members(), set(self.ids[:3]))
+
+    def test_form_saves_recipients(self):
+        add_mailing_recipients(self.mailing, self.ids[:2])
+        self.client.force_login(self.owner)
+        now = timezone.now()
+        self.client.post(
+            reverse("mailing:mailing_edit", args=[self.mailing.pk]),
+            {
+                "start_time": now.strftime("%Y-%m-%d %H:%M"),
+                "end_time": (now + timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+                "message": self.mailing.message_id,
+                "recipients": self.ids[1:3],
+            },
+        )
+        self.assertEqual(self.members(), set(self.ids[1:3]))
+
+
+@override_settings(MAILING_ATTEMPT_BUFFER_SIZE=1)
+class SendNewsletterTest(TestCase):
+    """Отправка рассылок командой send_newsletter"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+
+    def send(self, mailing, *args):
+        call_command(
+            "send_newsletter", "--mailing-id", mailing.pk, *args, stdout=io.StringIO()
+        )
+
+    def test_rerun_skips_sent_deliveries(self):
+        mailing = create_mailing(self.owner, recipients=3)
+        prepare_outbox(mailing)
+        sent = mailing.deliveries.order_by("pk").first()
+        sent.status = "sent"
+        sent.save()
+
+        self.send(mailing)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertNotIn(sent.recipient.email, [m.to[0] for m in mail.outbox])
+
+        self.send(mailing)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mailing.deliveries.count(), 3)
+        self.assertEqual(MailingAttempt.objects.count(), 2)
+
+    def test_permanent_failure_completes_mailing(self):
+        mailing = create_mailing(self.owner, recipients=2)
+        refused = mailing.recipients.order_by("pk").first().email
+
+        def send(session, message):
+            if message.to == [refused]:
+                raise smtplib.SMTPResponseException(550, b"no such user")
+
+        with mock.patch.object(SMTPSession, "send", send):
+            self.send(mailing)
+        mailing.refresh_from_db()
+        self.assertEqual(mailing.status, "completed")
+        self.assertEqual(
+            mailing.deliveries.get(recipient__email=refused).status, "failed"
+        )
+
+    def test_attempts_are_stamped_when_recorded(self):
+        mailing = create_mailing(self.owner, recipients=2)
+        start = timezone.now()
+        clock = iter(start + timedelta(hours=hour) for hour in range(100))
+
+        with mock.patch("mailing.attempts.timezone.now", lambda: next(clock)):
+            self.send(mailing)
+        times = list(MailingAttempt.objects.values_list("datetime_attempt", flat=True))
+        # Попытки долгой отправки попадают в свои часы, а не в час запуска
+        self.assertEqual(len(set(times)), 2)
+        self.assertTrue(all(time >= start for time in times))
+
+    def test_failed_flush_does_not_mark_sent_email_failed(self):
+        mailing = create_mailing(self.owner, recipients=1)
+        with mock.patch(
+            "mailing.attempts.update_mailing_stats",
+            side_effect=[DatabaseError("deadlock detected"), None],
+        ):
+            with self.assertRaises(DatabaseError):
+                self.send(mailing)
+
+        delivery = mailing.deliveries.get()
+        self.assertEqual(delivery.status, "sent")
+        self.assertEqual(delivery.attempt_count, 1)
+        self.assertEqual(
+            list(MailingAttempt.objects.values_list("status", flat=True)), ["success"]
+        )
+
+
+@override_settings(MAILING_CHUNK_SIZE=3)
+class SendNewsletterWorkersTest(TransactionTestCase):
+    """Отправка рассылки несколькими потоками"""
+
+    @unittest.skipUnless(
+        connection.vendor == "postgresql", "SQLite блокирует таблицы между потоками"
+    )
+    def test_each_recipient_gets_one_email(self):
+        owner = User.objects.create_user(email="owner@example.com")
+        mailing = create_mailing(owner, recipients=10)
+        stdout = io.StringIO()
+        call_command(
+            "send_newsletter", "--mailing-id", mailing.pk, "--workers", 2, stdout=stdout
+        )
+
+        self.assertCountEqual(
+            [message.to[0] for message in mail.outbox],
+            mailing.recipients.values_list("email", flat=True),
+        )
+        self.assertFalse(mailing.deliveries.exclude(status="sent").exists())
+        self.assertIn("Поток 2:", stdout.getvalue())
+
+    def test_workers_must_be_positive(self):
+        with self.assertRaises(CommandError):
+            call_command("send_newsletter", "--workers", 0, stdout=io.StringIO())
+
+
+class AttemptCountersTest(TestCase):
+    """Счетчики попыток обновляются в постоянном порядке строк"""
+
+    def setUp(self):
+        owner = User.objects.create_user(email="owner@example.com")
+        self.mailings = [create_mailing(owner) for _ in range(3)]
+        now = timezone.now()
+        # Попытки идут в обратном порядке рассылок, как их могли бы
+        # записать несколько обработчиков
+        self.attempts = [
+            MailingAttempt(
+                mailing=mailing,
+                status=status,
+                datetime_attempt=now,
+                mail_server_response="",
+            )
+            for mailing in reversed(self.mailings)
+            for status in ("success", "failed")
+        ]
+
+    def updated_mailings(self, function):
+        """id рассылок в порядке запросов UPDATE, выполненных function"""
+        with CaptureQueriesContext(connection) as context:
+            function(self.attempts)
+        return [
+            int(match)
+            for query in context.captured_queries
+            if query["sql"].startswith("UPDATE")
+            for match in re.findall(r'"mailing_id" = (\d+)', query["sql"])
+        ]
+
+    def test_mailing_stats_are_locked_in_mailing_order(self):
+        ids = self.updated_mailings(update_mailing_stats)
+        self.assertEqual(ids, sorted(m.pk for m in self.mailings))
+        self.assertEqual(
+            list(
+                MailingStats.objects.order_by("mailing").values_list("total", "success")
+            ),
+            [(2, 1)] * 3,
+        )
+
+    def test_rollups_are_locked_in_key_order(self):
+        ids = self.updated_mailings(update_attempt_rollups)
+        # По строке на рассылку, период и статус: 3 x 2 x 2
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(
+            set(MailingAttemptRollup.objects.values_list("count", flat=True)), {1}
+        )
+
+
+class MailingJobTest(TestCase):
+    """Задания на отправку и фоновый обработчик run_mail_worker"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        self.mailing = create_mailing(self.owner, recipients=3)
+
+    def run_worker(self):
+        call_command("run_mail_worker", "--once", stdout=io.StringIO())
+
+    def test_enqueue_does_not_duplicate_jobs(self):
+        job, created = enqueue_mailing(self.mailing)
+        self.assertTrue(created)
+        self.assertEqual(enqueue_mailing(self.mailing), (job, False))
+
+    def test_concurrent_enqueue_does_not_duplicate_jobs(self):
+        job = MailingJob.objects.create(mailing=self.mailing)
+        first = QuerySet.first
+        checks = []
+
+        def stale_first(queryset):
+            # Первая проверка выполнена до того, как другой запрос создал задание
+            checks.append(queryset)
+            return None if len(checks) == 1 else first(queryset)
+
+        with mock.patch.object(QuerySet, "first", stale_first):
+            self.assertEqual(enqueue_mailing(self.mailing), (job, False))
+        self.assertEqual(self.mailing.jobs.count(), 1)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MailingJob.objects.create(mailing=self.mailing, status="running")
+        MailingJob.objects.create(mailing=self.mailing, status="done")
+
+    def test_worker_runs_queued_job(self):
+        job, _ = enqueue_mailing(self.mailing)
+        self.run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual((job.total, job.success_count, job.failed_count), (3, 3, 0))
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_stale_running_job_is_requeued(self):
+        # Обработчик убит после первого письма: задание осталось
+        # выполняющимся, одна доставка уже отмечена отправленной
+        prepare_outbox(self.mailing)
+        self.mailing.deliveries.filter(
+            pk=self.mailing.deliveries.order_by("pk").first().pk
+        ).update(status="sent")
+        stale = timezone.now() - timedelta(hours=1)
+        job = MailingJob.objects.create(
+            mailing=self.mailing, status="running", started_at=stale, heartbeat_at=stale
+        )
+        self.assertEqual(enqueue_mailing(self.mailing), (job, False))
+
+        with self.assertLogs("mailing.management.commands.run_mail_worker", "WARNING"):
+            self.run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.success_count, 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(self.mailing.deliveries.exclude(status="sent").exists())
+
+    def test_running_job_with_recent_heartbeat_is_kept(self):
+        now = timezone.now()
+        job = MailingJob.objects.create(
+            mailing=self.mailing, status="running", started_at=now, heartbeat_at=now
+        )
+        self.assertEqual(requeue_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "running")
+
+    @override_settings(MAILING_JOB_STALE_TIMEOUT=60)
+    def test_job_without_heartbeat_is_judged_by_start_time(self):
+        MailingJob.objects.create(
+            mailing=self.mailing,
+            status="running",
+            started_at=timezone.now() - timedelta(minutes=5),
+        )
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertTrue(self.mailing.jobs.filter(status="queued").exists())
+
+
+class RetryTest(TestCase):
+    """Повторная отправка после ошибок и завершение рассылки"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        self.mailing = create_mailing(self.owner, recipients=2)
+        self.refused = self.mailing.recipients.order_by("pk").first().email
+        self.sent = []
+
+    def fail_with(self, code):
+        """SMTP-сервер отвечает code на письмо первому получателю"""
+
+        def send(session, message):
+            if message.to == [self.refused]:
+                raise smtplib.SMTPResponseException(code, b"refused")
+            self.sent.append(message.to[0])
+
+        return mock.patch.object(SMTPSession, "send", send)
+
+    def make_retries_due(self):
+        self.mailing.deliveries.filter(status="retry").update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_mailing_with_retries_completes_after_last_retry(self):
+        with self.fail_with(451):
+            self.assertEqual(send_mailing(self.mailing), {"success": 1, "failed": 1})
+        self.mailing.refresh_from_db()
+        self.assertEqual(self.mailing.status, "running")
+        delivery = self.mailing.deliveries.get(recipient__email=self.refused)
+        self.assertEqual((delivery.status, delivery.attempt_count), ("retry", 1))
+        self.assertGreater(delivery.next_attempt_at, timezone.now())
+
+        # Время повтора еще не подошло
+        self.assertEqual(send_due_retries(), {"success": 0, "failed": 0})
+
+        self.make_retries_due()
+        with mock.patch.object(SMTPSession, "send"):
+            self.assertEqual(send_due_retries(), {"success": 1, "failed": 0})
+        self.mailing.refresh_from_db()
+        self.assertEqual(self.mailing.status, "completed")
+        self.assertFalse(self.mailing.deliveries.exclude(status="sent").exists())
+
+    def test_permanent_failure_does_not_block_completion(self):
+        with self.fail_with(550):
+            send_mailing(self.mailing)
+        self.mailing.refresh_from_db()
+        self.assertEqual(self.mailing.status, "completed")
+        delivery = self.mailing.deliveries.get(recipient__email=self.refused)
+        self.assertEqual(delivery.status, "failed")
+        self.assertIsNone(delivery.next_attempt_at)
+
+    @mock.patch("mailing.services.RETRY_CLAIM_SIZE", 2)
+    def test_retries_are_claimed_in_small_batches(self):
+        mailing = create_mailing(self.owner, recipients=5)
+        prepare_outbox(mailing)
+        mailing.deliveries.update(
+            status="retry", next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+        unclaimed = []
+
+        def send(session, message):
+            unclaimed.append(
+                mailing.deliveries.filter(
+                    status="retry", next_attempt_at__lte=timezone.now()
+                ).count()
+            )
+
+        with mock.patch.object(SMTPSession, "send", send):
+            self.assertEqual(send_due_retries(limit=4), {"success": 4, "failed": 0})
+        # Аренда берется на пачку, а не на все доступные повторы сразу
+        self.assertEqual(unclaimed, [3, 3, 1, 1])
+        self.assertEqual(mailing.deliveries.filter(status="sent").count(), 4)
+
+    def test_transient_errors(self):
+        for error, transient in (
+            (smtplib.SMTPResponseException(451, b"try later"), True),
+            (smtplib.SMTPResponseException(550, b"no such user"), False),
+            (smtplib.SMTPRecipientsRefused({"a@example.com": (452, b"full")}), True),
+            (smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no")}), False),
+            (smtplib.SMTPServerDisconnected("closed"), True),
+            (ConnectionRefusedError(), True),
+            (TimeoutError(), True),
+            (smtplib.SMTPNotSupportedError("STARTTLS"), False),
+            (smtplib.SMTPException("No suitable authentication method found."), False),
+            (ValueError("bad header"), False),
+        ):
+            with self.subTest(error=error):
+                self.assertIs(is_transient(error), transient)
+
+    @override_settings(
+        MAILING_RETRY={"MAX_ATTEMPTS": 3, "BASE_DELAY": 60, "MAX_DELAY": 3600}
+    )
+    def test_retry_delay_grows_up_to_max(self):
+        for attempt_count, delay in ((1, 60), (2, 120), (3, 240), (20, 3600)):
+            with self.subTest(attempt_count=attempt_count):
+                for _ in range(20):
+                    self.assertTrue(delay / 2 <= retry_delay(attempt_count) <= delay)
+
+    @override_settings(
+        MAILING_RETRY={"MAX_ATTEMPTS": 3, "BASE_DELAY": 60, "MAX_DELAY": 3600}
+    )
+    def test_last_attempt_fails_delivery(self):
+        prepare_outbox(self.mailing)
+        delivery = self.mailing.deliveries.first()
+        error = smtplib.SMTPResponseException(451, b"try later")
+        now = timezone.now()
+
+        for status in ("retry", "retry", "failed"):
+            schedule_retry(delivery, error, now)
+            self.assertEqual(delivery.status, status)
+        self.assertEqual(delivery.attempt_count, 3)
+        self.assertIsNone(delivery.next_attempt_at)
+
+
+class RateLimiterTest(TestCase):
+    """Ограничитель скорости в SMTP-сессии"""
+
+    def message(self):
+        return EmailMessage(subject="Тема", body="Текст", to=["client@example.com"])
+
+    def test_unavailable_redis_does_not_stop_sending(self):
+        client = redis.Redis(
+            port=1, socket_connect_timeout=0.1, retry=Retry(NoBackoff(), 0)
+        )
+        limiter = RateLimiter(
+            client, rate=1, burst=1, min_rate=0.5, recovery_step=0.1, daily_limit=10
+        )
+        with self.assertLogs("mailing.throttle", "WARNING") as logs:
+            with SMTPSession(limiter=limiter) as session:
+                session.send(self.message())
+                session.send(self.message())
+        self.assertEqual(len(mail.outbox), 2)
+        # Предупреждение пишется один раз на сбой, а не на каждое письмо
+        self.assertEqual(len(logs.records), 1)
+
+    def test_failed_send_refunds_daily_limit(self):
+        limiter = mock.Mock(spec=RateLimiter)
+        limiter.acquire.return_value = "mailing:throttle:day:20260101"
+        connection = mock.Mock()
+        connection.send_messages.side_effect = smtplib.SMTPResponseException(
+            451, b"slow down"
+        )
+
+        with self.assertRaises(smtplib.SMTPResponseException):
+            SMTPSession(connection=connection, limiter=limiter).send(self.message())
+        limiter.refund.assert_called_once_with("mailing:throttle:day:20260101")
+        limiter.slow_down.assert_called_once_with()
+
+        connection.send_messages.side_effect = None
+        limiter.reset_mock()
+        SMTPSession(connection=connection, limiter=limiter).send(self.message())
+        limiter.refund.assert_not_called()
+        limiter.speed_up.assert_called_once_with()
+
+    @override_settings(
+        MAILING_RATE_LIMIT={
+            "REDIS_URL": "redis://127.0.0.1:1/0",
+            "RATE": 0,
+            "BURST": 10,
+            "MIN_RATE": 0.2,
+            "RECOVERY_STEP": 0.05,
+            "DAILY_LIMIT": 0,
+        }
+    )
+    def test_limiter_is_off_without_rate(self):
+        get_rate_limiter.cache_clear()
+        self.addCleanup(get_rate_limiter.cache_clear)
+        self.assertIsNone(get_rate_limiter())
+        self.assertIsNone(SMTPSession().limiter)
+
+
+class SMTPSessionTest(TestCase):
+    """Одно SMTP-соединение на пачку писем"""
+
+    def setUp(self):
+        self.connection = mock.Mock()
+
+    def send(self, count, batch_size=100):
+        with SMTPSession(batch_size=batch_size, connection=self.connection) as session:
+            for number in range(count):
+                session.send(
+                    EmailMessage(subject="Тема", to=[f"client{number}@example.com"])
+                )
+
+    def test_connection_is_reused_within_batch(self):
+        self.send(5, batch_size=2)
+        self.assertEqual(self.connection.send_messages.call_count, 5)
+        # Переподключение перед 3-м и 5-м письмом и закрытие в конце сессии
+        self.assertEqual(self.connection.close.call_count, 3)
+
+    def test_reconnects_after_disconnect(self):
+        self.connection.send_messages.side_effect = [
+            smtplib.SMTPServerDisconnected("Connection unexpectedly closed"),
+            None,
+            None,
+        ]
+        self.send(2)
+        self.assertEqual(self.connection.send_messages.call_count, 3)
+        self.assertEqual(self.connection.close.call_count, 2)
+
+    def test_refused_message_is_not_resent(self):
+        self.connection.send_messages.side_effect = smtplib.SMTPResponseException(
+            550, b"no such user"
+        )
+        with self.assertRaises(smtplib.SMTPResponseException):
+            self.send(1)
+        self.connection.send_messages.assert_called_once()
+
+
+class SchedulerTest(TestCase):
+    """Постановка рассылок в очередь в момент начала"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        now = timezone.now()
+        self.due = create_mailing(self.owner, start_time=now - timedelta(minutes=1))
+        self.later = create_mailing(self.owner, start_time=now + timedelta(hours=1))
+        create_mailing(self.owner, status="completed")
+        self.scheduler = Scheduler(stdout=io.StringIO())
+        self.scheduler.resync()
+
+    def queued(self):
+        return list(MailingJob.objects.values_list("mailing_id", flat=True))
+
+    def test_due_mailing_is_enqueued_once(self):
+        self.assertEqual(set(self.scheduler.scheduled), {self.due.pk, self.later.pk})
+        self.scheduler.run_due()
+        self.scheduler.run_due()
+        self.assertEqual(self.queued(), [self.due.pk])
+        self.assertEqual(list(self.scheduler.scheduled), [self.later.pk])
+
+    def test_reschedule_moves_start_time(self):
+        Mailing.objects.filter(pk=self.later.pk).update(
+            start_time=timezone.now() - timedelta(seconds=1)
+        )
+        self.scheduler.reschedule(self.later.pk)
+        self.scheduler.run_due()
+        self.assertCountEqual(self.queued(), [self.due.pk, self.later.pk])
+
+    def test_reschedule_drops_started_mailing(self):
+        Mailing.objects.filter(pk=self.later.pk).update(status="running")
+        self.scheduler.reschedule(self.later.pk)
+        self.assertNotIn(self.later.pk, self.scheduler.scheduled)
+
+
+class ArchiveAttemptsTest(TestCase):
+    """Перенос старых попыток в почасовой архив"""
+
+    def setUp(self):
+        self.mailing = create_mailing(
+            User.objects.create_user(email="owner@example.com")
+        )
+        now = timezone.now()
+        for days, minutes, status in (
+            (3, 0, "success"),
+            (3, 1, "success"),
+            (3, 2, "failed"),
+            (2, 0, "success"),
+            (0, 0, "success"),
+        ):
+            MailingAttempt.objects.create(
+                mailing=self.mailing,
+                datetime_attempt=now - timedelta(days=days, minutes=minutes),
+                status=status,
+                mail_server_response="",
+            )
+        rebuild_mailing_stats()
+        rebuild_attempt_rollups()
+
+    def totals(self):
+        stats = MailingStats.objects.get(mailing=self.mailing)
+        rollups = MailingAttemptRollup.objects.values("period", "status").annotate(
+            count=Sum("count")
+        )
+        return (
+            (stats.total, stats.success, stats.failed, stats.last_attempt_at),
+            sorted((r["period"], r["status"], r["count"]) for r in rollups),
+        )
+
+    def test_totals_survive_archive_and_rebuild(self):
+        before = self.totals()
+        self.assertEqual(before[0][:3], (5, 4, 1))
+
+        with tempfile.TemporaryDirectory() as export_dir:
+            archived = archive_attempts(
+                timezone.now() - timedelta(days=1), batch_size=2, export_dir=export_dir
+            )
+            (path,) = Path(export_dir).iterdir()
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                self.assertEqual(len(file.readlines()), 4)
+
+        self.assertEqual(archived, 4)
+        self.assertEqual(MailingAttempt.objects.count(), 1)
+        self.assertEqual(self.totals(), before)
+
+        rebuild_mailing_stats()
+        rebuild_attempt_rollups()
+        self.assertEqual(self.totals(), before)
+
+
+class CsvExportTest(TestCase):
+    """Выгрузка статистики и попыток в CSV"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        self.mailing = create_mailing(self.owner)
+        self.other = create_mailing(User.objects.create_user(email="other@example.com"))
+        for mailing, status in (
+            (self.mailing, "success"),
+            (self.mailing, "success"),
+            (self.mailing, "failed"),
+            (self.other, "success"),
+        ):
+            MailingAttempt.objects.create(
+                mailing=mailing,
+                datetime_attempt=timezone.now(),
+                status=status,
+                mail_server_response="250 OK",
+            )
+        rebuild_mailing_stats()
+        self.client.force_login(self.owner)
+
+    def export(self, name, **kwargs):
+        response = self.client.get(reverse(f"mailing:{name}", kwargs=kwargs))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertTrue(content.startswith("\ufeff"))
+        return list(csv.reader(io.StringIO(content[1:])))
+
+    def test_statistics_of_own_mailings(self):
+        header, *rows = self.export("statistics_export")
+        self.assertEqual(len(header), 11)
+        self.assertEqual(
+            [(row[0], row[6], row[7], row[8], row[10]) for row in rows],
+            [(str(self.mailing.pk), "3", "2", "1", "66.67")],
+        )
+
+    def test_attempts(self):
+        header, *rows = self.export("attempts_export", pk=self.mailing.pk)
+        self.assertEqual(header[0], "ID")
+        self.assertEqual([row[2] for row in rows], ["success", "success", "failed"])
+        response = self.client.get(
+            reverse("mailing:attempts_export", kwargs={"pk": self.other.pk})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ExplainQueriesTest(TestCase):
+    """Тестовые данные explain_queries"""
+
+    def test_seeded_mailings_are_never_sent(self):
+        call_command(
+            "explain_queries", "--mailings", 30, "--attempts", 1, stdout=io.StringIO()
+        )
+        mailings = Mailing.objects.filter(owner__email="explain-queries@example.com")
+        self.assertEqual(mailings.count(), 30)
+        self.assertFalse(mailings.filter(end_time__gte=timezone.now()).exists())
+        self.assertFalse(
+            MailingDelivery.objects.filter(status__in=["pending", "retry"]).exists()
+        )
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class DashboardCacheTest(TestCase):
+    """Версии и блокировка кэша статистики"""
+
+    def setUp(self):
+        cache.clear()
+        self.scope = User.objects.create_user(email="owner@example.com").pk
+        self.version = get_version(self.scope)
+
+    def test_version_changes_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_dashboard([self.scope])
+            self.assertEqual(get_version(self.scope), self.version)
+        self.assertNotEqual(get_version(self.scope), self.version)
+
+    def test_version_is_kept_on_rollback(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(DatabaseError):
+                with transaction.atomic():
+                    invalidate_dashboard([self.scope])
+                    raise DatabaseError("rollback")
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_version(self.scope), self.version)
+
+    def test_reader_waits_for_computing_request(self):
+        key = f"{KEY_PREFIX}:{self.scope}:{self.version}"
+        # Статистику считает другой запрос и сохраняет ее, пока этот ждет
+        cache.add(f"{key}:lock", 1)
+        compute = mock.Mock(return_value={"total": 2})
+
+        def computed(seconds):
+            cache.set(key, {"total": 1})
+
+        with mock.patch("mailing.dashboard.time.sleep", side_effect=computed):
+            self.assertEqual(get_dashboard(self.scope, compute), {"total": 1})
+        compute.assert_not_called()
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://127.0.0.1:1/0",
+                "OPTIONS": {
+                    "socket_connect_timeout": 0.1,
+                    "retry": Retry(NoBackoff(), 0),
+                },
+            }
+        }
+    )
+    def test_unavailable_redis(self):
+        with self.assertLogs("mailing.dashboard", "WARNING"):
+            self.assertEqual(
+                get_dashboard(self.scope, lambda: {"total": 1}), {"total": 1}
+            )
+        with self.assertLogs("mailing.dashboard", "WARNING"):
+            with self.captureOnCommitCallbacks(execute=True):
+                Recipient.objects.create(
+                    owner_id=self.scope, email="client@example.com", full_name="Клиент"
+                )
+
+
+class KeysetPaginationTest(TestCase):
+    """Постраничный вывод списков по курсору"""
+
+    def setUp(self):
+        manager = User.objects.create_user(
+            email="manager@example.com", role=User.Role.MANAGER
+        )
+        # Три времени регистрации на 45 пользователей: порядок внутри
+        # одинаковых date_joined задает pk
+        joined = timezone.now()
+        for number in range(44):
+            User.objects.create_user(
+                email=f"user{number}@example.com",
+                date_joined=joined - timedelta(microseconds=number % 3),
+            )
+        self.expected = list(
+            User.objects.order_by("-date_joined", "-pk").values_list("pk", flat=True)
+        )
+        self.assertIn(manager.pk, self.expected)
+        self.client.force_login(manager)
+
+    def get_page(self, **params):
+        response = self.client.get(reverse("mailing:manager_users"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context["page_obj"]
+
+    def test_next_and_previous_cursors(self):
+        pages = [self.get_page()]
+        while pages[-1].has_next():
+            pages.append(self.get_page(after=pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertFalse(pages[0].has_previous())
+        self.assertEqual([user.pk for page in pages for user in page], self.expected)
+
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.get_page(before=page.previous_cursor)
+            self.assertEqual([user.pk for user in page], [user.pk for user in expected])
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_invalid_cursor(self):
+        def cursor(values):
+            data = json.dumps(values).encode()
+            return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+        for value in (
+            "not a cursor",
+            cursor("2026-01-01"),
+            cursor(["2026-01-01 00:00:00+00:00"]),
+            cursor(["not a date", "1"]),
+            cursor(["2026-01-01 00:00:00+00:00", "x"]),
+        ):
+            for direction in ("after", "before"):
+                with self.subTest(cursor=value, direction=direction):
+                    response = self.client.get(
+                        reverse("mailing:manager_users"), {direction: value}
+                    )
+                    self.assertEqual(response.status_code, 404)
+
+
+class AttemptTrendsTest(TestCase):
+    """Почасовые и посуточные счетчики попыток и график динамики"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        other = User.objects.create_user(email="other@example.com")
+        self.manager = User.objects.create_user(
+            email="manager@example.com", role=User.Role.MANAGER
+        )
+        self.mailing = create_mailing(self.owner)
+        self.second = create_mailing(self.owner)
+        self.foreign = create_mailing(other)
+
+        self.now = timezone.now()
+        with AttemptWriter() as attempts:
+            for mailing, hours, status in (
+                (self.mailing, 0, "success"),
+                (self.mailing, 0, "failed"),
+                (self.mailing, 3, "success"),
+                (self.second, 3, "success"),
+                (self.second, 72, "failed"),
+                (self.foreign, 0, "success"),
+            ):
+                attempts.add(mailing, status, "", self.now - timedelta(hours=hours))
+
+    def rollups(self):
+        return {
+            (r.mailing_id, r.period, r.bucket, r.status): r.count
+            for r in MailingAttemptRollup.objects.all()
+        }
+
+    def counted(self):
+        """Счетчики, посчитанные заново по самим попыткам"""
+        counters = {}
+        for attempt in MailingAttempt.objects.all():
+            for period in ("hour", "day"):
+                key = (
+                    attempt.mailing_id,
+                    period,
+                    rollup_bucket(attempt.datetime_attempt, period),
+                    attempt.status,
+                )
+                counters[key] = counters.get(key, 0) + 1
+        return counters
+
+    def test_rebuild_matches_attempts(self):
+        self.assertEqual(self.rollups(), self.counted())
+        MailingAttemptRollup.objects.update(count=100)
+        rebuild_attempt_rollups()
+        self.assertEqual(self.rollups(), self.counted())
+
+    def test_hourly_points_are_zero_filled(self):
+        trends = get_attempt_trends(self.owner, 1)
+        self.assertEqual(trends["period"], "hour")
+        buckets = [point["bucket"] for point in trends["points"]]
+        self.assertEqual(len(buckets), 24)
+        self.assertEqual(buckets[-1], rollup_bucket(self.now, "hour"))
+        self.assertTrue(
+            all(b - a == timedelta(hours=1) for a, b in zip(buckets, buckets[1:]))
+        )
+        self.assertEqual((trends["success"], trends["failed"]), (3, 1))
+        self.assertEqual(trends["points"][-1]["failure_rate"], 50)
+        self.assertEqual(sum(1 for point in trends["points"] if point["total"]), 2)
+
+    def test_daily_points(self):
+        trends = get_attempt_trends(self.owner, 7)
+        self.assertEqual(trends["period"], "day")
+        self.assertEqual(len(trends["points"]), 7)
+        self.assertEqual(trends["points"][-1]["bucket"], rollup_bucket(self.now, "day"))
+        self.assertEqual((trends["success"], trends["failed"]), (3, 2))
+
+    def test_mailing_filter_and_owner_scope(self):
+        trends = get_attempt_trends(self.owner, 7, self.second.pk)
+        self.assertEqual((trends["success"], trends["failed"]), (1, 1))
+        trends = get_attempt_trends(self.owner, 7, self.foreign.pk)
+        self.assertEqual((trends["success"], trends["failed"]), (0, 0))
+        trends = get_attempt_trends(self.manager, 7)
+        self.assertEqual((trends["success"], trends["failed"]), (4, 2))
+
+
+class KeysetChunksTest(TestCase):
+    """Чтение выборок пачками по ключу"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        self.mailing = create_mailing(self.owner, recipients=6)
+
+    def test_exact_multiple_of_chunk_size(self):
+        ids = list(Recipient.objects.order_by("pk").values_list("pk", flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(keyset_chunks(Recipient.objects.all(), 3))
+        self.assertEqual(
+            [[r.pk for r in chunk] for chunk in chunks], [ids[:3], ids[3:]]
+        )
+        # Третий запрос возвращает пустую пачку и завершает чтение
+        self.assertEqual(len(queries), 3)
+
+    def test_empty_queryset(self):
+        self.assertEqual(list(keyset_chunks(Recipient.objects.none(), 3)), [])
+        self.assertEqual(list(keyset_chunks(Recipient.objects.filter(pk=0), 3)), [])
+
+    def test_non_pk_key(self):
+        Recipient.objects.create(owner=self.owner, email="a@example.com", full_name="А")
+        emails = Recipient.objects.values_list("email", flat=True)
+        chunks = list(keyset_chunks(emails, 4, key="email"))
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 3])
+        self.assertEqual(sum(chunks, []), sorted(emails))
+
+    def test_rows_changed_during_iteration(self):
+        prepare_outbox(self.mailing)
+        deliveries = list(self.mailing.deliveries.order_by("pk"))
+        seen = []
+        for delivery in iter_pending_deliveries(self.mailing, chunk_size=2):
+            seen.append(delivery.pk)
+            if len(seen) == 1:
+                # Уже прочитанная доставка отправлена, еще не прочитанная
+                # отправлена другим обработчиком, добавлен новый получатель
+                delivery.status = "sent"
+                delivery.save()
+                deliveries[4].status = "sent"
+                deliveries[4].save()
+                self.mailing.recipients.add(
+                    Recipient.objects.create(
+                        owner=self.owner, email="new@example.com", full_name="Новый"
+                    )
+                )
+                prepare_outbox(self.mailing)
+
+        added = self.mailing.deliveries.get(recipient__email="new@example.com")
+        expected = [d.pk for d in deliveries if d.pk != deliveries[4].pk] + [added.pk]
+        self.assertEqual(seen, expected)
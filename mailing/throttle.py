@@ -0,0 +1,204 @@
+import logging
+import time
+from functools import cache
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Ведро токенов. Время берется у Redis, чтобы часы разных серверов
+# с обработчиками не влияли на общий лимит.
+# Возвращает "0", если токен выдан, время ожидания в секундах, если нет,
+# и "-1", если исчерпан дневной лимит
+ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate = tonumber(redis.call('GET', KEYS[2]) or ARGV[1])
+local burst = tonumber(ARGV[2])
+local daily_limit = tonumber(ARGV[3])
+
+if daily_limit > 0 and tonumber(redis.call('GET', KEYS[3]) or 0) >= daily_limit then
+    return '-1'
+end
+
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or burst)
+local updated = tonumber(redis.call('HGET', KEYS[1], 'updated') or now)
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+
+if tokens < 1 then
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    return tostring((1 - tokens) / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'updated', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+if daily_limit > 0 then
+    redis.call('INCR', KEYS[3])
+    redis.call('EXPIRE', KEYS[3], 172800)
+end
+return '0'
+"""
+
+# Изменение текущей скорости: rate * ARGV[2] + ARGV[3] в пределах [min, max].
+# Сниженная скорость хранится 10 минут, после чего снова действует максимум
+ADJUST_SCRIPT = """
+local rate = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+rate = rate * tonumber(ARGV[2]) + tonumber(ARGV[3])
+rate = math.max(tonumber(ARGV[4]), math.min(tonumber(ARGV[1]), rate))
+if rate >= tonumber(ARGV[1]) then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], tostring(rate), 'EX', 600)
+end
+return tostring(rate)
+"""
+
+
+class DailyLimitExceeded(Exception):
+    """Исчерпан дневной лимит писем у SMTP-провайдера"""
+
+
+class RateLimiter:
+    """
+    Ограничение скорости отправки писем, общее для всех процессов и потоков.
+
+    Работает как ведро токенов на burst писем, которое пополняется со
+    скоростью rate писем в секунду. Состояние хранится в Redis, поэтому все
+    обработчики расходуют один бюджет. Если провайдер отвечает 4xx
+    (притормозите), скорость уменьшается вдвое, но не ниже min_rate, а после
+    каждой успешной отправки снова растет на recovery_step до rate.
+    Отдельно считается число писем за сутки (UTC), при достижении
+    daily_limit выбрасывается DailyLimitExceeded. Место в дневном лимите
+    занимается вместе с токеном, а если письмо не отправлено, возвращается
+    через refund().
+
+    Если Redis недоступен, ограничитель пропускает письма без ограничения
+    и пишет предупреждение в лог, чтобы сбой Redis не останавливал отправку.
+    """
+
+    key_prefix = "mailing:throttle"
+
+    def __init__(
+        self,
+        client,
+        rate,
+        burst,
+        min_rate,
+        recovery_step,
+        daily_limit=0,
+    ):
+        self.client = client
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.recovery_step = recovery_step
+        self.daily_limit = daily_limit
+        # Скорость снижал этот процесс - он же и возвращает ее обратно,
+        # чтобы не ходить в Redis после каждого письма на полной скорости
+        self.throttled = False
+        self.unavailable = False
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+        self._adjust = client.register_script(ADJUST_SCRIPT)
+
+    @property
+    def bucket_key(self):
+        return f"{self.key_prefix}:bucket"
+
+    @property
+    def rate_key(self):
+        return f"{self.key_prefix}:rate"
+
+    @property
+    def daily_key(self):
+        return f"{self.key_prefix}:day:{timezone.now():%Y%m%d}"
+
+    def acquire(self):
+        """
+        Ждет, пока можно отправить следующее письмо. Возвращает ключ
+        дневного счетчика, в котором за письмом занято место, или None
+        """
+        try:
+            while True:
+                daily_key = self.daily_key
+                wait = float(
+                    self._acquire(
+                        keys=[self.bucket_key, self.rate_key, daily_key],
+                        args=[self.rate, self.burst, self.daily_limit],
+                    )
+                )
+                if wait == 0:
+                    self.available()
+                    return daily_key if self.daily_limit > 0 else None
+                if wait < 0:
+                    raise DailyLimitExceeded(
+                        f"Достигнут дневной лимит отправки: {self.daily_limit} писем"
+                    )
+                time.sleep(wait)
+        except redis.RedisError as e:
+            self.failed(e)
+            return None
+
+    def refund(self, daily_key):
+        """Письмо не отправлено - вернуть место в дневном лимите"""
+        if daily_key is None:
+            return
+        try:
+            self.client.decr(daily_key)
+        except redis.RedisError as e:
+            self.failed(e)
+
+    def slow_down(self):
+        """Провайдер ограничивает отправку - уменьшить скорость вдвое"""
+        self.throttled = True
+        try:
+            self._adjust(keys=[self.rate_key], args=[self.rate, 0.5, 0, self.min_rate])
+        except redis.RedisError as e:
+            self.failed(e)
+
+    def speed_up(self):
+        """Письмо принято - постепенно вернуть скорость к максимальной"""
+        if not self.throttled:
+            return
+        try:
+            rate = float(
+                self._adjust(
+                    keys=[self.rate_key],
+                    args=[self.rate, 1, self.recovery_step, self.min_rate],
+                )
+            )
+        except redis.RedisError as e:
+            self.failed(e)
+            return
+        self.throttled = rate < self.rate
+
+    def failed(self, error):
+        """Redis недоступен: письма идут без ограничения, сбой пишется в лог один раз"""
+        if not self.unavailable:
+            logger.warning(
+                f"Ограничитель скорости отправки недоступен, письма отправляются "
+                f"без ограничения: {error}"
+            )
+        self.unavailable = True
+
+    def available(self):
+        if self.unavailable:
+            logger.info("Ограничитель скорости отправки снова работает")
+        self.unavailable = False
+
+
+@cache
+def get_rate_limiter():
+    """Общий для процесса ограничитель из настроек или None, если он выключен"""
+    config = settings.MAILING_RATE_LIMIT
+    if config["RATE"] <= 0:
+        return None
+    return RateLimiter(
+        client=redis.Redis.from_url(config["REDIS_URL"]),
+        rate=config["RATE"],
+        burst=config["BURST"],
+        min_rate=config["MIN_RATE"],
+        recovery_step=config["RECOVERY_STEP"],
+        daily_limit=config["DAILY_LIMIT"],
+    )
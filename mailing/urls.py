@@ -1,8 +1,14 @@
 from django.urls import path
 
 from mailing.apps import MailingConfig
-from mailing.views import (MailingCreateView, MailingDeleteView,
-                           MailingListView, MailingUpdateView, start_mailing)
+from mailing.views import (MailingAttemptExportView, MailingCreateView,
+                           MailingDeleteView, MailingJobDetailView,
+                           MailingJobStatusView, MailingListView,
+                           MailingStatisticsExportView, MailingTrendView,
+                           MailingUpdateView, ManagerMailingListView,
+                           ManagerRecipientListView, ManagerUserListView,
+                           start_mailing, toggle_mailing_status,
+                           toggle_user_block)
 
 app_name = MailingConfig.name
 
@@ -14,4 +20,40 @@ urlpatterns = [
         "mailing/<int:pk>/delete/", MailingDeleteView.as_view(), name="mailing_delete"
     ),
     path("mailing/<int:mailing_id>/start/", start_mailing, name="start_mailing"),
+    path("mailing/trends/", MailingTrendView.as_view(), name="trends"),
+    path(
+        "mailing/statistics.csv",
+        MailingStatisticsExportView.as_view(),
+        name="statistics_export",
+    ),
+    path(
+        "mailing/<int:pk>/attempts.csv",
+        MailingAttemptExportView.as_view(),
+        name="attempts_export",
+    ),
+    path("manager/users/", ManagerUserListView.as_view(), name="manager_users"),
+    path(
+        "manager/users/<int:user_id>/toggle-block/",
+        toggle_user_block,
+        name="toggle_user_block",
+    ),
+    path(
+        "manager/mailings/", ManagerMailingListView.as_view(), name="manager_mailings"
+    ),
+    path(
+        "manager/mailings/<int:mailing_id>/toggle-status/",
+        toggle_mailing_status,
+        name="toggle_mailing_status",
+    ),
+    path(
+        "manager/recipients/",
+        ManagerRecipientListView.as_view(),
+        name="manager_recipients",
+    ),
+    path("mailing/jobs/<int:pk>/", MailingJobDetailView.as_view(), name="job_detail"),
+    path(
+        "mailing/jobs/<int:pk>/status/",
+        MailingJobStatusView.as_view(),
+        name="job_status",
+    ),
 ]
@@ -1,45 +1,46 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
-from django.views.generic import CreateView, DeleteView, ListView, UpdateView
-
-from mailing.models import Mailing
-from mailing.services import send_mailing
+from django.views.decorators.http import require_POST
+from django.views.generic import (CreateView, DeleteView, DetailView, ListView,
+                                  TemplateView, UpdateView)
+
+from mailing.export import EXPORT_CHUNK_SIZE, streaming_csv_response
+from mailing.forms import (MailingForm, ManagerMailingFilterForm,
+                           ManagerRecipientFilterForm, ManagerUserFilterForm)
+from mailing.models import Mailing, MailingJob
+from mailing.services import (annotate_statistics, enqueue_mailing,
+                              get_attempt_trends, mailing_statistics,
+                              related_count, success_rate)
 from messaging.models import Message
+from pagination import KeysetPaginationMixin
 from permissions import (ManagerRequiredMixin, OwnerEditPermissionMixin,
                          OwnerQuerysetMixin)
-from recipients.models import Recipient
+from recipients.models import Recipient, Segment
 from users.models import User
 
 
-class MailingListView(LoginRequiredMixin, OwnerQuerysetMixin, ListView):
+class MailingListView(
+    LoginRequiredMixin, OwnerQuerysetMixin, KeysetPaginationMixin, ListView
+):
     model = Mailing
     template_name = "mailing/mailings_list.html"
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-
-        for mailing in queryset:
-            attempts = mailing.attempts.all()
-            total = attempts.count()
-            successful = attempts.filter(status="success").count()
-            failed = attempts.filter(status="failed").count()
-            success_rate = (successful / total * 100) if total > 0 else 0
-
-            mailing.stats = {
-                "total": total,
-                "successful": successful,
-                "failed": failed,
-                "success": round(success_rate, 2),
-            }
+        return annotate_statistics(super().get_queryset().select_related("message"))
 
-        return queryset
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        for mailing in context["object_list"]:
+            mailing.stats = mailing_statistics(mailing)
+        return context
 
 
 class MailingCreateView(LoginRequiredMixin, CreateView):
     model = Mailing
-    fields = ["start_time", "end_time", "message", "recipients"]
+    form_class = MailingForm
     template_name = "mailing/mailing_form.html"
     success_url = reverse_lazy("mailing:mailings_list")
 
@@ -58,6 +59,9 @@ class MailingCreateView(LoginRequiredMixin, CreateView):
             form.fields["message"].queryset = Message.objects.filter(
                 owner=self.request.user
             )
+            form.fields["segment"].queryset = Segment.objects.filter(
+                owner=self.request.user
+            )
         return form
 
 
@@ -68,7 +72,7 @@ class MailingUpdateView(
     UpdateView,
 ):
     model = Mailing
-    fields = ["start_time", "end_time", "message", "recipients"]
+    form_class = MailingForm
     template_name = "mailing/mailing_form.html"
     success_url = reverse_lazy("mailing:mailings_list")
 
@@ -83,6 +87,9 @@ class MailingUpdateView(
             form.fields["message"].queryset = Message.objects.filter(
                 owner=self.request.user
             )
+            form.fields["segment"].queryset = Segment.objects.filter(
+                owner=self.request.user
+            )
         return form
 
 
@@ -97,30 +104,99 @@ class MailingDeleteView(
     success_url = reverse_lazy("mailing:mailings_list")
 
 
-class ManagerUserListView(LoginRequiredMixin, ManagerRequiredMixin, ListView):
+class ManagerFilterMixin:
+    """Фильтр списка менеджера по параметрам GET, форма в контексте filter_form"""
+
+    filter_form_class = None
+
+    def get_filter_form(self):
+        if not hasattr(self, "filter_form"):
+            self.filter_form = self.filter_form_class(self.request.GET or None)
+        return self.filter_form
+
+    def get_queryset(self):
+        return self.get_filter_form().filter(super().get_queryset())
+
+    def get_context_data(self, **kwargs):
+        kwargs.setdefault("filter_form", self.get_filter_form())
+        return super().get_context_data(**kwargs)
+
+
+class ManagerUserListView(
+    LoginRequiredMixin,
+    ManagerRequiredMixin,
+    ManagerFilterMixin,
+    KeysetPaginationMixin,
+    ListView,
+):
     model = User
     template_name = "mailing/manager_users_list.html"
     context_object_name = "users"
-    paginate_by = 20
+    filter_form_class = ManagerUserFilterForm
+    keyset_ordering = ("-date_joined", "-pk")
 
     def get_queryset(self):
-        return User.objects.all().order_by("-date_joined")
+        return (
+            super()
+            .get_queryset()
+            .annotate(
+                mailings_count=related_count(Mailing.objects.all(), "owner"),
+                recipients_count=related_count(Recipient.objects.all(), "owner"),
+            )
+        )
 
 
-class ManagerMailingListView(LoginRequiredMixin, ManagerRequiredMixin, ListView):
+class ManagerMailingListView(
+    LoginRequiredMixin,
+    ManagerRequiredMixin,
+    ManagerFilterMixin,
+    KeysetPaginationMixin,
+    ListView,
+):
     model = Mailing
     template_name = "mailing/manager_mailings_list.html"
     context_object_name = "mailings"
-    paginate_by = 20
+    filter_form_class = ManagerMailingFilterForm
+
+    def get_queryset(self):
+        return annotate_statistics(
+            super()
+            .get_queryset()
+            .select_related("owner", "message")
+            .annotate(
+                recipients_count=related_count(
+                    Mailing.recipients.through.objects.all(), "mailing"
+                )
+            )
+        )
 
 
-class ManagerRecipientListView(LoginRequiredMixin, ManagerRequiredMixin, ListView):
+class ManagerRecipientListView(
+    LoginRequiredMixin,
+    ManagerRequiredMixin,
+    ManagerFilterMixin,
+    KeysetPaginationMixin,
+    ListView,
+):
     model = Recipient
     template_name = "mailing/manager_recipients_list.html"
     context_object_name = "recipients"
-    paginate_by = 20
+    filter_form_class = ManagerRecipientFilterForm
+
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .select_related("owner")
+            .annotate(
+                mailings_count=related_count(
+                    Mailing.recipients.through.objects.all(), "recipient"
+                )
+            )
+        )
 
 
+@require_POST
 def toggle_user_block(request, user_id):
     if not (hasattr(request.user, "role") and request.user.role == "manager"):
         messages.error(request, "У вас нет прав для выполнения этого действия")
@@ -131,10 +207,11 @@ def toggle_user_block(request, user_id):
     user.save()
 
     action = "заблокирован" if user.is_blocked else "разблокирован"
-    messages.success(request, f"Пользователь {user.username} {action}")
+    messages.success(request, f"Пользователь {user.email} {action}")
     return redirect("mailing:manager_users")
 
 
+@require_POST
 def toggle_mailing_status(request, mailing_id):
     if not (hasattr(request.user, "role") and request.user.role == "manager"):
         messages.error(request, "У вас нет прав для выполнения этого действия")
@@ -177,9 +254,139 @@ def start_mailing(request, mailing_id):
         messages.error(request, "Эта рассылка отключена менеджером")
         return redirect("mailing:mailings_list")
 
-    results = send_mailing(mailing)
-    messages.success(
-        request,
-        f"Рассылка завершена. Успешно: {results['success']}, Неудачно: {results['failed']}",
-    )
-    return redirect("mailing:mailings_list")
+    job, created = enqueue_mailing(mailing)
+    if created:
+        messages.success(request, "Рассылка поставлена в очередь на отправку")
+    else:
+        messages.info(request, "Рассылка уже отправляется")
+    return redirect("mailing:job_detail", pk=job.pk)
+
+
+class MailingJobDetailView(LoginRequiredMixin, DetailView):
+    model = MailingJob
+    template_name = "mailing/mailing_job_detail.html"
+    context_object_name = "job"
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related("mailing")
+        if hasattr(self.request.user, "role") and self.request.user.role == "manager":
+            return queryset
+        return queryset.filter(mailing__owner=self.request.user)
+
+
+class MailingJobStatusView(MailingJobDetailView):
+    """Состояние задания в JSON для обновления страницы прогресса"""
+
+    def render_to_response(self, context, **response_kwargs):
+        job = self.object
+        return JsonResponse(
+            {
+                "id": job.id,
+                "mailing": job.mailing_id,
+                "status": job.status,
+                "status_display": job.get_status_display(),
+                "total": job.total,
+                "success": job.success_count,
+                "failed": job.failed_count,
+                "progress": job.progress,
+                "error": job.error,
+                "started_at": job.started_at,
+                "finished_at": job.finished_at,
+            }
+        )
+
+
+class MailingAttemptExportView(LoginRequiredMixin, OwnerQuerysetMixin, DetailView):
+    """Попытки отправки рассылки в CSV. Архивные попытки не выгружаются"""
+
+    model = Mailing
+
+    def get(self, request, *args, **kwargs):
+        mailing = self.get_object()
+        attempts = (
+            mailing.attempts.order_by("pk")
+            .values_list("id", "datetime_attempt", "status", "mail_server_response")
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return streaming_csv_response(
+            f"mailing-{mailing.pk}-attempts.csv",
+            ["ID", "Дата и время попытки", "Статус", "Ответ почтового сервера"],
+            attempts,
+        )
+
+
+class MailingStatisticsExportView(LoginRequiredMixin, OwnerQuerysetMixin, ListView):
+    """Статистика рассылок в CSV: владельцу - его рассылки, менеджеру - все"""
+
+    model = Mailing
+
+    def get(self, request, *args, **kwargs):
+        mailings = (
+            annotate_statistics(self.get_queryset())
+            .order_by("pk")
+            .values_list(
+                "id",
+                "owner__email",
+                "message__topic_message",
+                "status",
+                "start_time",
+                "end_time",
+                "total_attempts",
+                "successful_attempts",
+                "failed_attempts",
+                "last_attempt_at",
+            )
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+
+        def rows():
+            for row in mailings:
+                total, successful = row[6], row[7]
+                yield row + (round(success_rate(successful, total), 2),)
+
+        return streaming_csv_response(
+            "mailings-statistics.csv",
+            [
+                "ID",
+                "Владелец",
+                "Тема сообщения",
+                "Статус",
+                "Начало отправки",
+                "Окончание отправки",
+                "Всего попыток",
+                "Успешных",
+                "Неудачных",
+                "Последняя попытка",
+                "Успешность, %",
+            ],
+            rows(),
+        )
+
+
+class MailingTrendView(LoginRequiredMixin, TemplateView):
+    """Динамика отправки писем по часам или суткам"""
+
+    template_name = "mailing/mailing_trends.html"
+    max_days = 365
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            days = int(self.request.GET.get("days", 7))
+        except ValueError:
+            days = 7
+        days = min(max(days, 1), self.max_days)
+
+        try:
+            mailing_id = int(self.request.GET.get("mailing", ""))
+        except ValueError:
+            mailing_id = None
+
+        context.update(
+            {
+                "days": days,
+                "mailing_id": mailing_id,
+                "trends": get_attempt_trends(self.request.user, days, mailing_id),
+            }
+        )
+        return context
@@ -0,0 +1,74 @@
+import timeit
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from messaging.templating import MessageTemplate
+
+
+def render_with_replace(message, recipient):
+    """Прежний способ: цепочка str.replace() на каждого получателя"""
+    body = message.text_message.replace("{full_name}", recipient.full_name)
+    body = body.replace("{email}", recipient.email)
+    subject = message.topic_message.replace("{full_name}", recipient.full_name)
+    subject = subject.replace("{email}", recipient.email)
+    return subject, body
+
+
+class Command(BaseCommand):
+    help = "Сравнение скорости подстановки в шаблон: str.replace и MessageTemplate"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipients", type=int, default=100_000, help="Количество получателей"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Количество повторов замера"
+        )
+
+    def handle(self, *args, **options):
+        count = options.get("recipients")
+        repeat = options.get("repeat")
+
+        message = SimpleNamespace(
+            topic_message="{full_name}, новости для вас",
+            text_message=(
+                "Здравствуйте, {full_name}!\n\n"
+                + "Текст рассылки с новостями и предложениями. " * 8
+                + "\n\nПисьмо отправлено на {email}. "
+                "Чтобы отписаться, ответьте на это письмо с адреса {email}."
+            ),
+        )
+        recipients = [
+            SimpleNamespace(full_name=f"Получатель {i}", email=f"user{i}@example.com")
+            for i in range(count)
+        ]
+
+        def replace():
+            for recipient in recipients:
+                render_with_replace(message, recipient)
+
+        def compiled():
+            template = MessageTemplate(message)
+            for recipient in recipients:
+                template.render(recipient)
+
+        template = MessageTemplate(message)
+        for recipient in recipients[:100]:
+            assert template.render(recipient) == render_with_replace(message, recipient)
+
+        replace_time = min(timeit.repeat(replace, number=1, repeat=repeat))
+        compiled_time = min(timeit.repeat(compiled, number=1, repeat=repeat))
+
+        self.stdout.write(f"Получателей: {count}, лучший из {repeat} замеров")
+        self.stdout.write(
+            f"str.replace:     {replace_time:.3f} с "
+            f"({replace_time / count * 1_000_000:.2f} мкс на письмо)"
+        )
+        self.stdout.write(
+            f"MessageTemplate: {compiled_time:.3f} с "
+            f"({compiled_time / count * 1_000_000:.2f} мкс на письмо)"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Ускорение: {replace_time / compiled_time:.2f}x")
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="message",
+            name="text_message",
+            field=models.TextField(
+                help_text="Подстановки: {full_name} - Ф.И.О. получателя, {email} - email получателя",
+                max_length=500,
+                verbose_name="Текст сообщения",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="message",
+            name="topic_message",
+            field=models.CharField(
+                help_text="Подстановки: {full_name} - Ф.И.О. получателя, {email} - email получателя",
+                max_length=150,
+                verbose_name="Тема сообщения",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:20
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнить в транзакции
+    atomic = False
+
+    dependencies = [
+        ("messaging", "0003_message_placeholders_help"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="message",
+            index=models.Index(fields=["owner", "-id"], name="message_owner_pk_idx"),
+        ),
+    ]
@@ -1,16 +1,32 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
+from messaging.templating import PLACEHOLDERS_HELP
 from users.models import User
 
 
 class Message(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Владелец")
-    topic_message = models.CharField(max_length=150, verbose_name="Тема сообщения")
-    text_message = models.TextField(max_length=500, verbose_name="Текст сообщения")
+    topic_message = models.CharField(
+        max_length=150, verbose_name="Тема сообщения", help_text=PLACEHOLDERS_HELP
+    )
+    text_message = models.TextField(
+        max_length=500, verbose_name="Текст сообщения", help_text=PLACEHOLDERS_HELP
+    )
 
     def __str__(self):
         return f"{self.topic_message}"
 
     class Meta:
+        indexes = [
+            # Постраничный вывод сообщений владельца по курсору
+            models.Index(fields=["owner", "-id"], name="message_owner_pk_idx"),
+            # Поиск рассылок по теме сообщения (icontains)
+            GinIndex(
+                OpClass(Upper("topic_message"), name="gin_trgm_ops"),
+                name="message_topic_trgm_idx",
+            ),
+        ]
         verbose_name = "Сообщение"
         verbose_name_plural = "Сообщения"
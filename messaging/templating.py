@@ -0,0 +1,62 @@
+"""
+Подстановка данных получателя в тему и текст сообщения.
+
+Поддерживаемые подстановки (одинаково в теме и в тексте):
+
+    {full_name} - Ф.И.О. получателя
+    {email}     - email получателя
+
+Фигурные скобки вокруг любого другого текста остаются в письме как есть.
+Сообщение разбирается один раз на рассылку в строку для оператора %
+и набор полей получателя, после чего каждое письмо собирается за один
+проход без повторных str.replace(). Подставленные значения повторно
+не разбираются, поэтому Ф.И.О. вида "{email}" останется в письме как есть.
+"""
+
+import re
+from operator import attrgetter
+
+PLACEHOLDERS = {
+    "full_name": "Ф.И.О. получателя",
+    "email": "email получателя",
+}
+
+PLACEHOLDERS_HELP = "Подстановки: " + ", ".join(
+    f"{{{name}}} - {description}" for name, description in PLACEHOLDERS.items()
+)
+
+PLACEHOLDER_RE = re.compile(r"\{(%s)\}" % "|".join(PLACEHOLDERS))
+
+
+class CompiledTemplate:
+    """Строка с подстановками, разобранная для форматирования оператором %"""
+
+    def __init__(self, text):
+        # split() с группой возвращает [текст, имя, текст, имя, ..., текст]
+        parts = PLACEHOLDER_RE.split(text)
+        names = parts[1::2]
+        self.text = text
+        self.format_string = "".join(
+            "%s" if index % 2 else part.replace("%", "%%")
+            for index, part in enumerate(parts)
+        )
+        # Для одного имени attrgetter вернет строку, а не кортеж;
+        # оператор % принимает и то и другое
+        self.get_values = attrgetter(*names) if names else None
+
+    def render(self, recipient):
+        if self.get_values is None:
+            return self.text
+        return self.format_string % self.get_values(recipient)
+
+
+class MessageTemplate:
+    """Тема и текст сообщения, разобранные один раз для всей рассылки"""
+
+    def __init__(self, message):
+        self.subject = CompiledTemplate(message.topic_message)
+        self.body = CompiledTemplate(message.text_message)
+
+    def render(self, recipient):
+        """Возвращает тему и текст письма для получателя"""
+        return self.subject.render(recipient), self.body.render(recipient)
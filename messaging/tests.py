@@ -0,0 +1,51 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from messaging.models import Message
+from messaging.templating import CompiledTemplate, MessageTemplate
+from recipients.models import Recipient
+
+
+class MessageTemplateTest(SimpleTestCase):
+    """Подстановка данных получателя в тему и текст"""
+
+    def setUp(self):
+        self.recipient = Recipient(email="ivanov@example.com", full_name="Иванов Иван")
+
+    def render(self, text):
+        return CompiledTemplate(text).render(self.recipient)
+
+    def test_placeholders(self):
+        template = MessageTemplate(
+            Message(
+                topic_message="Здравствуйте, {full_name}",
+                text_message="Письмо для {email} ({full_name})",
+            )
+        )
+        self.assertEqual(
+            template.render(self.recipient),
+            (
+                "Здравствуйте, Иванов Иван",
+                "Письмо для ivanov@example.com (Иванов Иван)",
+            ),
+        )
+
+    def test_other_text_is_kept(self):
+        self.assertEqual(
+            self.render("Скидка 100% {phone} {}"), "Скидка 100% {phone} {}"
+        )
+        self.assertEqual(self.render("{email} 50%"), "ivanov@example.com 50%")
+
+    def test_values_are_not_parsed_again(self):
+        self.recipient.full_name = "{email} 5%s"
+        self.assertEqual(self.render("{full_name}"), "{email} 5%s")
+
+    def test_message_is_parsed_once(self):
+        template = MessageTemplate(
+            Message(topic_message="Тема", text_message="Текст {full_name}")
+        )
+        with mock.patch("messaging.templating.PLACEHOLDER_RE") as placeholder_re:
+            for _ in range(3):
+                template.render(self.recipient)
+        placeholder_re.split.assert_not_called()
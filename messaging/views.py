@@ -3,10 +3,13 @@ from django.urls import reverse_lazy
 from django.views.generic import CreateView, DeleteView, ListView, UpdateView
 
 from messaging.models import Message
+from pagination import KeysetPaginationMixin
 from permissions import OwnerEditPermissionMixin, OwnerQuerysetMixin
 
 
-class MessageListView(LoginRequiredMixin, OwnerQuerysetMixin, ListView):
+class MessageListView(
+    LoginRequiredMixin, OwnerQuerysetMixin, KeysetPaginationMixin, ListView
+):
     model = Message
     template_name = "messaging/messages_list.html"
 
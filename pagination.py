@@ -0,0 +1,133 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+class KeysetPage:
+    """Страница списка с курсорами на соседние страницы"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginationMixin:
+    """
+    Постраничный вывод ListView по курсору (keyset) вместо OFFSET.
+
+    Список сортируется по keyset_ordering, последнее поле должно быть
+    уникальным (обычно pk), чтобы порядок был однозначным. Следующая
+    страница выбирается условием "после последней строки текущей"
+    (?after=курсор), предыдущая - "перед первой" (?before=курсор), поэтому
+    любая страница читается по индексу так же быстро, как первая.
+    Номеров страниц и общего числа записей нет.
+
+    В шаблон передается page_obj с has_next/has_previous и
+    next_cursor/previous_cursor, см. users/includes/keyset_pagination.html
+    """
+
+    paginate_by = 20
+    keyset_ordering = ("-pk",)
+
+    def paginate_queryset(self, queryset, page_size):
+        after = self.request.GET.get("after")
+        before = self.request.GET.get("before")
+
+        if before:
+            ordering = [self.reverse_field(field) for field in self.keyset_ordering]
+            queryset = queryset.filter(
+                self.cursor_filter(queryset.model, before, ordering)
+            )
+        else:
+            ordering = list(self.keyset_ordering)
+            if after:
+                queryset = queryset.filter(
+                    self.cursor_filter(queryset.model, after, ordering)
+                )
+
+        rows = list(queryset.order_by(*ordering)[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if before:
+            rows.reverse()
+
+        page = KeysetPage(rows)
+        if rows:
+            if has_more or before:
+                page.next_cursor = self.encode_cursor(rows[-1])
+            if (has_more and before) or after:
+                page.previous_cursor = self.encode_cursor(rows[0])
+        return None, page, rows, page.has_other_pages()
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def encode_cursor(self, obj):
+        # value_to_string() сохраняет время с микросекундами, в отличие от
+        # DjangoJSONEncoder, иначе строки с одинаковыми миллисекундами терялись бы
+        opts = obj._meta
+        values = [
+            self.get_field(opts, field.lstrip("-")).value_to_string(obj)
+            for field in self.keyset_ordering
+        ]
+        data = json.dumps(values).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+    @staticmethod
+    def get_field(opts, name):
+        return opts.pk if name == "pk" else opts.get_field(name)
+
+    def decode_cursor(self, model, cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(data)
+        except ValueError:
+            raise Http404("Неверный курсор страницы")
+        if not isinstance(values, list) or len(values) != len(self.keyset_ordering):
+            raise Http404("Неверный курсор страницы")
+
+        opts = model._meta
+        try:
+            return [
+                self.get_field(opts, name).to_python(value)
+                for name, value in zip(
+                    (field.lstrip("-") for field in self.keyset_ordering), values
+                )
+            ]
+        except ValidationError:
+            raise Http404("Неверный курсор страницы")
+
+    def cursor_filter(self, model, cursor, ordering):
+        """
+        Условие "строка идет после курсора" для сортировки ordering:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        values = self.decode_cursor(model, cursor)
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
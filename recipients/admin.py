@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from messaging.models import Message
-from recipients.models import Recipient
+from recipients.models import Recipient, Segment, Tag
 
 
 @admin.register(Recipient)
@@ -9,6 +9,16 @@ class RecipientAdmin(admin.ModelAdmin):
     list_display = ("id", "email", "full_name", "comment")
 
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "owner")
+
+
+@admin.register(Segment)
+class SegmentAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "owner")
+
+
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     list_display = ("id", "topic_message", "text_message")
@@ -0,0 +1,107 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
+
+from recipients.models import Recipient, Segment, Tag
+from users.forms import StyleFormMixin
+
+
+def recipient_choice_label(recipient):
+    return f"{recipient.full_name} <{recipient.email}>"
+
+
+class RecipientAutocompleteWidget(forms.SelectMultiple):
+    """
+    Выбор клиентов с подгрузкой по мере ввода (static/js/recipient_autocomplete.js).
+    В HTML попадают только выбранные клиенты, остальные запрашиваются у
+    recipients:recipient_autocomplete страницами, поэтому размер формы не
+    зависит от числа клиентов
+    """
+
+    class Media:
+        js = ["js/recipient_autocomplete.js"]
+
+    def __init__(self, attrs=None):
+        attrs = {
+            "data-autocomplete-url": reverse_lazy("recipients:recipient_autocomplete"),
+            **(attrs or {}),
+        }
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [pk for pk in value if str(pk).isdigit()]
+        recipients = self.choices.queryset.filter(pk__in=selected).only(
+            "pk", "full_name", "email"
+        )
+        options = [
+            self.create_option(
+                name, recipient.pk, recipient_choice_label(recipient), True, index
+            )
+            for index, recipient in enumerate(recipients)
+        ]
+        return [(None, options, 0)]
+
+
+class RecipientForm(forms.ModelForm):
+    """Клиент с метками, которые вводятся через запятую и создаются при сохранении"""
+
+    tag_names = forms.CharField(
+        label="Метки",
+        required=False,
+        help_text="Через запятую, например: постоянный, опт",
+    )
+
+    class Meta:
+        model = Recipient
+        fields = ["email", "full_name", "comment"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial["tag_names"] = ", ".join(
+                tag.name for tag in self.instance.tags.all()
+            )
+
+    def clean_tag_names(self):
+        max_length = Tag._meta.get_field("name").max_length
+        names = []
+        for name in self.cleaned_data["tag_names"].split(","):
+            name = " ".join(name.split())
+            if len(name) > max_length:
+                raise ValidationError(
+                    f"Метка не может быть длиннее {max_length} символов"
+                )
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    def save(self, commit=True):
+        recipient = super().save(commit)
+        if commit:
+            self.save_tags()
+        return recipient
+
+    def save_tags(self):
+        recipient = self.instance
+        tags = [
+            Tag.objects.get_or_create(owner_id=recipient.owner_id, name=name)[0]
+            for name in self.cleaned_data["tag_names"]
+        ]
+        recipient.tags.set(tags)
+
+
+class SegmentForm(forms.ModelForm):
+    class Meta:
+        model = Segment
+        fields = ["name", "tags"]
+        widgets = {"tags": forms.CheckboxSelectMultiple}
+
+
+class RecipientImportForm(StyleFormMixin, forms.Form):
+    file = forms.FileField(
+        label="Файл CSV",
+        help_text=(
+            "Столбцы email и full_name (или «Ф.И.О.»), необязательный comment. "
+            "Кодировка UTF-8, разделитель - запятая или точка с запятой"
+        ),
+    )
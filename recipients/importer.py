@@ -0,0 +1,239 @@
+import csv
+import io
+from itertools import chain, islice
+
+from django.contrib.auth.base_user import BaseUserManager
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connection, transaction
+
+from mailing.dashboard import invalidate_dashboard
+from recipients.models import Recipient
+
+# Сколько строк файла проверяется и загружается за один раз
+IMPORT_CHUNK_SIZE = 5000
+
+# Сколько отклоненных строк с причинами показывается в отчете
+MAX_REPORTED_ERRORS = 100
+
+# Допустимые заголовки столбцов CSV
+COLUMN_ALIASES = {
+    "email": "email",
+    "e-mail": "email",
+    "электронная почта": "email",
+    "full_name": "full_name",
+    "ф.и.о.": "full_name",
+    "фио": "full_name",
+    "comment": "comment",
+    "комментарий": "comment",
+}
+REQUIRED_COLUMNS = ("email", "full_name")
+
+STAGING_TABLE = "recipient_import"
+
+
+class RecipientImportError(Exception):
+    """Файл нельзя загрузить целиком: нет заголовка или нужных столбцов"""
+
+
+class ImportReport:
+    """Итог загрузки: сколько строк добавлено, обновлено, пропущено, отклонено"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.errors = []
+
+    @property
+    def total(self):
+        return self.inserted + self.updated + self.skipped + self.rejected
+
+    def reject(self, line, reason):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, reason))
+
+
+def open_csv(stream):
+    """
+    Читает CSV построчно из текстового потока. Разделитель (запятая, точка
+    с запятой или табуляция) определяется по началу файла, первая строка -
+    заголовок. Возвращает читатель и список столбцов (email, full_name, comment)
+    """
+    head = stream.read(4096) + stream.readline()
+    try:
+        dialect = csv.Sniffer().sniff(head, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(chain(io.StringIO(head), stream), dialect)
+
+    header = next(reader, None)
+    if not header:
+        raise RecipientImportError("Файл пуст")
+    columns = [COLUMN_ALIASES.get(name.strip().lower()) for name in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise RecipientImportError(
+            f"В заголовке файла нет столбцов: {', '.join(missing)}"
+        )
+    return reader, columns
+
+
+def clean_row(values, columns):
+    """Проверяет и нормализует строку файла, возвращает (email, full_name, comment)"""
+    row = {"comment": ""}
+    for name, value in zip(columns, values):
+        if name:
+            row[name] = value.strip()
+
+    email = BaseUserManager.normalize_email(row.get("email", ""))
+    if not email:
+        raise ValidationError("не указан email")
+    validate_email(email)
+    if len(email) > Recipient._meta.get_field("email").max_length:
+        raise ValidationError("слишком длинный email")
+
+    full_name = row.get("full_name", "")
+    if not full_name:
+        raise ValidationError("не указаны Ф.И.О.")
+    if len(full_name) > Recipient._meta.get_field("full_name").max_length:
+        raise ValidationError("слишком длинные Ф.И.О.")
+
+    comment = row["comment"]
+    if len(comment) > Recipient._meta.get_field("comment").max_length:
+        raise ValidationError("слишком длинный комментарий")
+    return email, full_name, comment
+
+
+def clean_rows(reader, columns, report):
+    """
+    Проверенные строки файла без повторов email. Повтор адреса в самом
+    файле пропускается, ошибочные строки попадают в отчет
+    """
+    seen = set()
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        try:
+            row = clean_row(values, columns)
+        except ValidationError as e:
+            report.reject(reader.line_num, "; ".join(e.messages))
+            continue
+        if row[0] in seen:
+            report.skipped += 1
+            continue
+        seen.add(row[0])
+        yield row
+
+
+def chunks(rows, chunk_size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+def import_recipients(owner, stream, chunk_size=None):
+    """
+    Загружает клиентов владельца owner из CSV (текстовый поток stream).
+
+    Новые адреса добавляются, адреса, которые уже есть у этого владельца,
+    обновляются (Ф.И.О. и комментарий, если столбец есть в файле). Email
+    уникален во всей системе, поэтому адреса клиентов других пользователей
+    пропускаются. Вся загрузка - одна транзакция. Возвращает ImportReport
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    reader, columns = open_csv(stream)
+    update_fields = ["full_name"] + (["comment"] if "comment" in columns else [])
+
+    report = ImportReport()
+    rows = chunks(clean_rows(reader, columns, report), chunk_size)
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            copy_recipients(owner, rows, update_fields, report)
+        else:
+            bulk_upsert_recipients(owner, rows, update_fields, report)
+        if report.inserted or report.updated:
+            # bulk-операции не отправляют post_save, кэш статистики
+            # сбрасывается здесь
+            invalidate_dashboard([owner.pk])
+    return report
+
+
+def copy_recipients(owner, rows, update_fields, report):
+    """
+    PostgreSQL: строки загружаются COPY во временную таблицу и переносятся
+    в клиентов одним INSERT ... ON CONFLICT (email). Обновляются только
+    клиенты самого владельца, xmax = 0 отличает добавленные строки от
+    обновленных
+    """
+    table = connection.ops.quote_name(Recipient._meta.db_table)
+    assignments = ", ".join(f"{name} = EXCLUDED.{name}" for name in update_fields)
+    staged = 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {STAGING_TABLE} ("
+            "email varchar(254) NOT NULL, "
+            "full_name varchar(150) NOT NULL, "
+            "comment text NOT NULL"
+            ") ON COMMIT DROP"
+        )
+        for chunk in rows:
+            with cursor.copy(
+                f"COPY {STAGING_TABLE} (email, full_name, comment) FROM STDIN"
+            ) as copy:
+                for row in chunk:
+                    copy.write_row(row)
+            staged += len(chunk)
+
+        cursor.execute(
+            f"""
+            WITH upserted AS (
+                INSERT INTO {table} (owner_id, email, full_name, comment)
+                SELECT %s, email, full_name, comment FROM {STAGING_TABLE}
+                ON CONFLICT (email) DO UPDATE SET {assignments}
+                WHERE {table}.owner_id = EXCLUDED.owner_id
+                RETURNING xmax = 0 AS inserted
+            )
+            SELECT
+                count(*) FILTER (WHERE inserted),
+                count(*) FILTER (WHERE NOT inserted)
+            FROM upserted
+            """,
+            [owner.pk],
+        )
+        inserted, updated = cursor.fetchone()
+        cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+
+    report.inserted += inserted
+    report.updated += updated
+    report.skipped += staged - inserted - updated
+
+
+def bulk_upsert_recipients(owner, rows, update_fields, report):
+    """Другие СУБД: те же правила, что в copy_recipients, пачками через ORM"""
+    for chunk in rows:
+        existing = {
+            email: (pk, owner_id)
+            for email, pk, owner_id in Recipient.objects.filter(
+                email__in=[row[0] for row in chunk]
+            ).values_list("email", "pk", "owner_id")
+        }
+        new, changed = [], []
+        for email, full_name, comment in chunk:
+            recipient = Recipient(
+                owner=owner, email=email, full_name=full_name, comment=comment
+            )
+            if email not in existing:
+                new.append(recipient)
+            elif existing[email][1] == owner.pk:
+                recipient.pk = existing[email][0]
+                changed.append(recipient)
+            else:
+                report.skipped += 1
+
+        Recipient.objects.bulk_create(new, ignore_conflicts=True)
+        Recipient.objects.bulk_update(changed, update_fields)
+        report.inserted += len(new)
+        report.updated += len(changed)
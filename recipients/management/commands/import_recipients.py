@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipients.importer import (IMPORT_CHUNK_SIZE, RecipientImportError,
+                                 import_recipients)
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Загружает клиентов пользователя из CSV-файла (email, full_name, comment)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к CSV-файлу, '-' - стандартный ввод")
+        parser.add_argument(
+            "--owner", required=True, help="Email пользователя-владельца клиентов"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help="Количество строк, проверяемых и загружаемых за раз",
+        )
+
+    def handle(self, *args, **options):
+        path = options.get("path")
+        chunk_size = options.get("chunk_size")
+
+        if chunk_size < 1:
+            raise CommandError("Размер пачки должен быть больше нуля")
+        try:
+            owner = User.objects.get(email=options.get("owner"))
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options.get('owner')} не найден")
+
+        try:
+            if path == "-":
+                sys.stdin.reconfigure(encoding="utf-8-sig", newline="")
+                report = import_recipients(owner, sys.stdin, chunk_size)
+            else:
+                with open(path, encoding="utf-8-sig", newline="") as stream:
+                    report = import_recipients(owner, stream, chunk_size)
+        except (OSError, RecipientImportError, UnicodeDecodeError) as e:
+            raise CommandError(f"Не удалось загрузить файл: {e}")
+
+        for line, reason in report.errors:
+            self.stderr.write(f"Строка {line}: {reason}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Добавлено: {report.inserted}, обновлено: {report.updated}, "
+                f"пропущено: {report.skipped}, отклонено: {report.rejected}"
+            )
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:04
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipients", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="recipient",
+            options={
+                "permissions": [
+                    ("can_view_all_recipients", "Может просматривать всех клиентов")
+                ],
+                "verbose_name": "Клиент",
+                "verbose_name_plural": "Клиенты",
+            },
+        ),
+    ]
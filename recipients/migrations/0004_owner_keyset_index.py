@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:20
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнить в транзакции
+    atomic = False
+
+    dependencies = [
+        ("recipients", "0003_alter_recipient_options"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="recipient",
+            index=models.Index(fields=["owner", "-id"], name="recipient_owner_pk_idx"),
+        ),
+    ]
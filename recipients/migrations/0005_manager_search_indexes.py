@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:26
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнить в транзакции
+    atomic = False
+
+    dependencies = [
+        ("recipients", "0004_owner_keyset_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        # Расширение pg_trgm для индексов gin_trgm_ops
+        ("users", "0003_manager_search_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="recipient",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("email"), name="gin_trgm_ops"
+                ),
+                name="recipient_email_trgm_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="recipient",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("full_name"),
+                    name="gin_trgm_ops",
+                ),
+                name="recipient_full_name_trgm_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipients", "0006_comment_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, verbose_name="Название")),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Владелец",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Метка",
+                "verbose_name_plural": "Метки",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="Segment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, verbose_name="Название")),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Владелец",
+                    ),
+                ),
+                (
+                    "tags",
+                    models.ManyToManyField(
+                        blank=True,
+                        help_text="Клиенты с любой из выбранных меток. Без меток - все клиенты",
+                        related_name="segments",
+                        to="recipients.tag",
+                        verbose_name="Метки",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сегмент",
+                "verbose_name_plural": "Сегменты",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.AddField(
+            model_name="recipient",
+            name="tags",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="recipients",
+                to="recipients.tag",
+                verbose_name="Метки",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="tag",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "name"), name="unique_owner_tag"
+            ),
+        ),
+    ]
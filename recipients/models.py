@@ -1,5 +1,26 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Upper
+
+
+class Tag(models.Model):
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Владелец"
+    )
+    name = models.CharField(max_length=50, verbose_name="Название")
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "name"], name="unique_owner_tag")
+        ]
+        ordering = ["name"]
+        verbose_name = "Метка"
+        verbose_name_plural = "Метки"
 
 
 class Recipient(models.Model):
@@ -9,6 +30,9 @@ class Recipient(models.Model):
     email = models.EmailField(max_length=254, unique=True)
     full_name = models.CharField(max_length=150, verbose_name="Ф.И.О.")
     comment = models.TextField(max_length=500, blank=True, verbose_name="Комментарий")
+    tags = models.ManyToManyField(
+        Tag, blank=True, related_name="recipients", verbose_name="Метки"
+    )
 
     def __str__(self):
         return f"{self.full_name}"
@@ -17,5 +41,65 @@ class Recipient(models.Model):
         permissions = [
             ("can_view_all_recipients", "Может просматривать всех клиентов"),
         ]
+        indexes = [
+            # Постраничный вывод клиентов владельца по курсору
+            models.Index(fields=["owner", "-id"], name="recipient_owner_pk_idx"),
+            # Поиск клиентов по email, Ф.И.О. и комментарию (icontains)
+            GinIndex(
+                OpClass(Upper("email"), name="gin_trgm_ops"),
+                name="recipient_email_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("full_name"), name="gin_trgm_ops"),
+                name="recipient_full_name_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("comment"), name="gin_trgm_ops"),
+                name="recipient_comment_trgm_idx",
+            ),
+        ]
         verbose_name = "Клиент"
         verbose_name_plural = "Клиенты"
+
+
+class Segment(models.Model):
+    """
+    Сохраненная выборка клиентов владельца: все его клиенты или клиенты
+    с любой из меток tags. Состав не хранится, а вычисляется при каждой
+    отправке рассылки (см. members), поэтому новые клиенты и изменения
+    меток учитываются без пересохранения рассылок
+    """
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Владелец"
+    )
+    name = models.CharField(max_length=100, verbose_name="Название")
+    tags = models.ManyToManyField(
+        Tag,
+        blank=True,
+        related_name="segments",
+        verbose_name="Метки",
+        help_text="Клиенты с любой из выбранных меток. Без меток - все клиенты",
+    )
+
+    def __str__(self):
+        return self.name
+
+    def members(self):
+        """
+        Клиенты сегмента. Отбор по меткам - EXISTS по индексу tag_id
+        таблицы связи, поэтому клиент с несколькими метками не повторяется
+        """
+        recipients = Recipient.objects.filter(owner_id=self.owner_id)
+        tag_ids = list(self.tags.values_list("pk", flat=True))
+        if tag_ids:
+            tagged = Recipient.tags.through.objects.filter(
+                recipient=OuterRef("pk"), tag_id__in=tag_ids
+            )
+            recipients = recipients.filter(Exists(tagged))
+        return recipients
+
+    class Meta:
+        ordering = ["name"]
+        verbose_name = "Сегмент"
+        verbose_name_plural = "Сегменты"
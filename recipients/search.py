@@ -0,0 +1,68 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest, Upper
+
+# Триграммный индекс не помогает искать строки короче трех символов
+SEARCH_MIN_LENGTH = 3
+
+# Сколько лучших совпадений выводится в результатах поиска
+SEARCH_LIMIT = 50
+
+# Наименьшее сходство запроса со словами поля (word_similarity), при
+# котором клиент попадает в результаты поиска в PostgreSQL
+SEARCH_SIMILARITY = 0.5
+
+SEARCH_FIELDS = ("full_name", "email", "comment")
+
+
+def search_condition(query):
+    """Условие "query входит в Ф.И.О., email или комментарий" (icontains)"""
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f"{field}__icontains": query})
+    return condition
+
+
+def similarity_condition(query):
+    """
+    Условие "query похож на слова Ф.И.О., email или комментария" - оператор
+    %> из pg_trgm по UPPER(поле), его обслуживают GIN-индексы gin_trgm_ops.
+    Сравнение триграмм не зависит от регистра, UPPER нужен только индексу
+    """
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f"search_{field}__trigram_word_similar": query.upper()})
+    return condition
+
+
+def search_recipients(queryset, query):
+    """
+    Клиенты, похожие на query по Ф.И.О., email или комментарию, лучшие
+    совпадения первыми.
+
+    В PostgreSQL отбор - оператор %> (word_similarity не ниже
+    SEARCH_SIMILARITY) по GIN-индексам, поэтому частый запрос не отбирает
+    большую часть клиентов, а старое точное совпадение не теряется среди
+    новых частичных. Ранг - наибольшее сходство запроса со словами полей,
+    срез SEARCH_LIMIT в представлении становится LIMIT запроса.
+    На других СУБД отбор - icontains, порядок - от новых к старым
+    """
+    if connection.vendor != "postgresql":
+        return queryset.filter(search_condition(query)).order_by("-pk")
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)",
+            [str(SEARCH_SIMILARITY)],
+        )
+    return (
+        queryset.alias(**{f"search_{field}": Upper(field) for field in SEARCH_FIELDS})
+        .filter(similarity_condition(query))
+        .annotate(
+            rank=Greatest(
+                *(TrigramWordSimilarity(query, field) for field in SEARCH_FIELDS)
+            )
+        )
+        .order_by("-rank", "-pk")
+    )
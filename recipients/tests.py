@@ -0,0 +1,146 @@
+import io
+import unittest
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from recipients.importer import RecipientImportError, import_recipients
+from recipients.models import Recipient
+from recipients.search import SEARCH_LIMIT, search_recipients
+from users.models import User
+
+
+class RecipientImportTest(TestCase):
+    """Загрузка клиентов из CSV"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        other = User.objects.create_user(email="other@example.com")
+        Recipient.objects.create(owner=other, email="taken@example.com", full_name="B")
+        Recipient.objects.create(
+            owner=self.owner, email="own@example.com", full_name="Old", comment="c"
+        )
+
+    def load(self, text, chunk_size=2):
+        return import_recipients(self.owner, io.StringIO(text), chunk_size)
+
+    def test_report(self):
+        report = self.load(
+            "Email;ФИО\n"
+            "new@EXAMPLE.com;Новый\n"
+            "own@example.com;Новое имя\n"
+            "taken@example.com;Чужой\n"
+            "not-an-email;Ошибка\n"
+            "new@example.com;Повтор\n"
+            "noname@example.com;\n"
+        )
+        self.assertEqual(
+            (report.inserted, report.updated, report.skipped, report.rejected),
+            (1, 1, 2, 2),
+        )
+        self.assertEqual([line for line, reason in report.errors], [5, 7])
+
+        own = Recipient.objects.get(email="own@example.com")
+        self.assertEqual((own.full_name, own.comment), ("Новое имя", "c"))
+        taken = Recipient.objects.get(email="taken@example.com")
+        self.assertEqual(taken.full_name, "B")
+        self.assertTrue(
+            Recipient.objects.filter(email="new@example.com", owner=self.owner).exists()
+        )
+
+    def test_missing_columns(self):
+        with self.assertRaises(RecipientImportError):
+            self.load("name,phone\nИмя,123\n")
+
+
+class RecipientSearchTest(TestCase):
+    """Поиск в списке клиентов"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        other = User.objects.create_user(email="other@example.com")
+        for owner, email, full_name, comment in (
+            (self.owner, "ivanov@example.com", "Иванов Иван", ""),
+            (self.owner, "petrov@example.com", "Петров Петр", "друг Иванова"),
+            (self.owner, "sidorov@example.com", "Сидоров", ""),
+            (other, "ivanova@example.com", "Иванова", ""),
+        ):
+            Recipient.objects.create(
+                owner=owner, email=email, full_name=full_name, comment=comment
+            )
+        self.client.force_login(self.owner)
+
+    def search(self, query):
+        response = self.client.get(reverse("recipients:recipients_list"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def test_matches_owner_recipients_in_all_fields(self):
+        context = self.search("Иванов")
+        self.assertEqual(
+            sorted(r.email for r in context["object_list"]),
+            ["ivanov@example.com", "petrov@example.com"],
+        )
+        self.assertFalse(context["is_paginated"])
+        self.assertEqual(len(self.search("SIDOROV@")["object_list"]), 1)
+
+    def test_short_query_is_ignored(self):
+        context = self.search("Ив")
+        self.assertTrue(context["query_too_short"])
+        self.assertEqual(len(context["object_list"]), 3)
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "ранг только в PostgreSQL")
+    def test_old_exact_match_is_ranked_first(self):
+        for number in range(SEARCH_LIMIT + 5):
+            Recipient.objects.create(
+                owner=self.owner,
+                email=f"client{number}@example.com",
+                full_name=f"Сидоровский {number}",
+            )
+        object_list = self.search("Сидоров")["object_list"]
+        self.assertEqual(object_list[0].email, "sidorov@example.com")
+        self.assertEqual(len(object_list), SEARCH_LIMIT)
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "ранг только в PostgreSQL")
+    def test_dissimilar_recipients_are_not_ranked(self):
+        queryset = search_recipients(
+            Recipient.objects.filter(owner=self.owner), "Петров"
+        )
+        self.assertEqual([r.email for r in queryset], ["petrov@example.com"])
+        self.assertIn("%>", str(queryset.query))
+
+
+class RecipientAutocompleteTest(TestCase):
+    """JSON-список клиентов для выбора получателей"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com")
+        other = User.objects.create_user(email="other@example.com")
+        for number in range(25):
+            Recipient.objects.create(
+                owner=self.owner,
+                email=f"client{number}@example.com",
+                full_name=f"Клиент {number}",
+            )
+        Recipient.objects.create(
+            owner=other, email="client-other@example.com", full_name="Чужой"
+        )
+        self.client.force_login(self.owner)
+        self.url = reverse("recipients:recipient_autocomplete")
+
+    def test_pages(self):
+        first = self.client.get(self.url).json()
+        self.assertEqual(len(first["results"]), 20)
+        self.assertEqual(
+            first["results"][0]["text"], "Клиент 24 <client24@example.com>"
+        )
+        second = self.client.get(self.url, {"after": first["next"]}).json()
+        self.assertEqual(len(second["results"]), 5)
+        self.assertIsNone(second["next"])
+
+    def test_search_is_scoped_to_owner(self):
+        data = self.client.get(self.url, {"q": "client-"}).json()
+        self.assertEqual(data["results"], [])
+        data = self.client.get(self.url, {"q": "client1"}).json()
+        self.assertEqual(len(data["results"]), 11)
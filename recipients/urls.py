@@ -1,14 +1,23 @@
 from django.urls import path
 
 from recipients.apps import UsersConfig
-from recipients.views import (RecipientCreateView, RecipientDeleteView,
-                              RecipientListView, RecipientUpdateView)
+from recipients.views import (RecipientAutocompleteView, RecipientCreateView,
+                              RecipientDeleteView, RecipientImportView,
+                              RecipientListView, RecipientUpdateView,
+                              SegmentCreateView, SegmentDeleteView,
+                              SegmentListView, SegmentUpdateView)
 
 app_name = UsersConfig.name
 
 urlpatterns = [
     path("recipients/", RecipientListView.as_view(), name="recipients_list"),
     path("recipients/create/", RecipientCreateView.as_view(), name="recipient_create"),
+    path(
+        "recipients/autocomplete/",
+        RecipientAutocompleteView.as_view(),
+        name="recipient_autocomplete",
+    ),
+    path("recipients/import/", RecipientImportView.as_view(), name="recipient_import"),
     path(
         "recipients/<int:pk>/edit/",
         RecipientUpdateView.as_view(),
@@ -19,4 +28,12 @@ urlpatterns = [
         RecipientDeleteView.as_view(),
         name="recipient_delete",
     ),
+    path("segments/", SegmentListView.as_view(), name="segments_list"),
+    path("segments/create/", SegmentCreateView.as_view(), name="segment_create"),
+    path("segments/<int:pk>/edit/", SegmentUpdateView.as_view(), name="segment_edit"),
+    path(
+        "segments/<int:pk>/delete/",
+        SegmentDeleteView.as_view(),
+        name="segment_delete",
+    ),
 ]
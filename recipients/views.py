@@ -1,10 +1,22 @@
+import io
+
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import ProtectedError
+from django.http import JsonResponse
+from django.shortcuts import redirect
 from django.urls import reverse_lazy
-from django.views.generic import (CreateView, DeleteView, ListView,
+from django.views.generic import (CreateView, DeleteView, FormView, ListView,
                                   TemplateView, UpdateView)
 
+from pagination import KeysetPage, KeysetPaginationMixin
 from permissions import OwnerEditPermissionMixin, OwnerQuerysetMixin
-from recipients.models import Recipient
+from recipients.forms import (RecipientForm, RecipientImportForm, SegmentForm,
+                              recipient_choice_label)
+from recipients.importer import RecipientImportError, import_recipients
+from recipients.models import Recipient, Segment, Tag
+from recipients.search import (SEARCH_LIMIT, SEARCH_MIN_LENGTH,
+                               search_condition, search_recipients)
 
 
 class MainView(TemplateView):
@@ -14,16 +26,87 @@ class MainView(TemplateView):
 class RecipientListView(
     LoginRequiredMixin,
     OwnerQuerysetMixin,
+    KeysetPaginationMixin,
     ListView,
 ):
+    """
+    Список клиентов по страницам. С параметром ?q= - поиск: выводятся
+    SEARCH_LIMIT лучших совпадений без постраничного перехода
+    """
+
     model = Recipient
-    template_name = "recipients/recipients_list.html"
+    template_name = "recipients/recipient_list.html"
     context_object_name = "recipients"
 
+    def get_search_query(self):
+        query = self.request.GET.get("q", "").strip()
+        return query if len(query) >= SEARCH_MIN_LENGTH else ""
+
+    def get_queryset(self):
+        queryset = super().get_queryset().prefetch_related("tags")
+        query = self.get_search_query()
+        if query:
+            return search_recipients(queryset, query)
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.get_search_query():
+            return super().paginate_queryset(queryset, page_size)
+        rows = list(queryset[: SEARCH_LIMIT + 1])
+        self.search_truncated = len(rows) > SEARCH_LIMIT
+        rows = rows[:SEARCH_LIMIT]
+        return None, KeysetPage(rows), rows, False
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "").strip()
+        context.update(
+            {
+                "query": query,
+                "query_too_short": bool(query) and not self.get_search_query(),
+                "search_min_length": SEARCH_MIN_LENGTH,
+                "search_truncated": getattr(self, "search_truncated", False),
+            }
+        )
+        return context
+
+
+class RecipientAutocompleteView(
+    LoginRequiredMixin,
+    OwnerQuerysetMixin,
+    KeysetPaginationMixin,
+    ListView,
+):
+    """
+    Клиенты для выбора получателей рассылки в JSON: ?q= - поиск,
+    ?after= - следующая страница (курсор из поля next ответа)
+    """
+
+    model = Recipient
+
+    def get_queryset(self):
+        queryset = super().get_queryset().only("pk", "full_name", "email")
+        query = self.request.GET.get("q", "").strip()
+        if len(query) >= SEARCH_MIN_LENGTH:
+            queryset = queryset.filter(search_condition(query))
+        return queryset
+
+    def render_to_response(self, context, **response_kwargs):
+        page = context["page_obj"]
+        return JsonResponse(
+            {
+                "results": [
+                    {"id": recipient.pk, "text": recipient_choice_label(recipient)}
+                    for recipient in page
+                ],
+                "next": page.next_cursor,
+            }
+        )
+
 
 class RecipientCreateView(LoginRequiredMixin, CreateView):
     model = Recipient
-    fields = ["email", "full_name", "comment"]
+    form_class = RecipientForm
     template_name = "recipients/recipient_form.html"
     success_url = reverse_lazy("recipients:recipients_list")
 
@@ -32,6 +115,29 @@ class RecipientCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
+class RecipientImportView(LoginRequiredMixin, FormView):
+    """Загрузка клиентов из CSV, результат выводится на той же странице"""
+
+    form_class = RecipientImportForm
+    template_name = "recipients/recipient_import.html"
+
+    def form_valid(self, form):
+        stream = io.TextIOWrapper(
+            form.cleaned_data["file"].file, encoding="utf-8-sig", newline=""
+        )
+        try:
+            report = import_recipients(self.request.user, stream)
+        except RecipientImportError as e:
+            form.add_error("file", str(e))
+            return self.form_invalid(form)
+        except UnicodeDecodeError:
+            form.add_error("file", "Файл должен быть в кодировке UTF-8")
+            return self.form_invalid(form)
+        return self.render_to_response(
+            self.get_context_data(form=self.form_class(), report=report)
+        )
+
+
 class RecipientUpdateView(
     LoginRequiredMixin,
     OwnerEditPermissionMixin,
@@ -39,7 +145,7 @@ class RecipientUpdateView(
     UpdateView,
 ):
     model = Recipient
-    fields = ["email", "full_name", "comment"]
+    form_class = RecipientForm
     template_name = "recipients/recipient_form.html"
     success_url = reverse_lazy("recipients:recipients_list")
 
@@ -53,3 +159,66 @@ class RecipientDeleteView(
     model = Recipient
     template_name = "recipients/recipient_confirm_delete.html"
     success_url = reverse_lazy("recipients:recipients_list")
+
+
+class SegmentListView(LoginRequiredMixin, OwnerQuerysetMixin, ListView):
+    model = Segment
+    template_name = "recipients/segment_list.html"
+    context_object_name = "segments"
+
+    def get_queryset(self):
+        return super().get_queryset().select_related("owner").prefetch_related("tags")
+
+
+class SegmentCreateView(LoginRequiredMixin, CreateView):
+    model = Segment
+    form_class = SegmentForm
+    template_name = "recipients/segment_form.html"
+    success_url = reverse_lazy("recipients:segments_list")
+
+    def form_valid(self, form):
+        form.instance.owner = self.request.user
+        return super().form_valid(form)
+
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        form.fields["tags"].queryset = Tag.objects.filter(owner=self.request.user)
+        return form
+
+
+class SegmentUpdateView(
+    LoginRequiredMixin,
+    OwnerEditPermissionMixin,
+    OwnerQuerysetMixin,
+    UpdateView,
+):
+    model = Segment
+    form_class = SegmentForm
+    template_name = "recipients/segment_form.html"
+    success_url = reverse_lazy("recipients:segments_list")
+
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        # Метки сегмента - только метки его владельца
+        form.fields["tags"].queryset = Tag.objects.filter(owner=self.object.owner)
+        return form
+
+
+class SegmentDeleteView(
+    LoginRequiredMixin,
+    OwnerEditPermissionMixin,
+    OwnerQuerysetMixin,
+    DeleteView,
+):
+    model = Segment
+    template_name = "recipients/segment_confirm_delete.html"
+    success_url = reverse_lazy("recipients:segments_list")
+
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except ProtectedError:
+            messages.error(
+                self.request, "Сегмент используется в рассылках, его нельзя удалить"
+            )
+            return redirect("recipients:segments_list")
@@ -0,0 +1,104 @@
+// Выбор получателей рассылки с подгрузкой клиентов по мере ввода.
+// Исходный <select multiple data-autocomplete-url> скрывается и хранит
+// выбранных клиентов, найденные клиенты запрашиваются страницами в JSON.
+(function () {
+    const DELAY = 300;
+
+    function init(select) {
+        const url = select.dataset.autocompleteUrl;
+        const chosen = document.createElement("div");
+        const input = document.createElement("input");
+        const results = document.createElement("div");
+        const more = document.createElement("button");
+        let query = "";
+        let next = null;
+        let timer = null;
+        let request = 0;
+
+        select.hidden = true;
+        chosen.className = "d-flex flex-wrap gap-1 mb-2";
+        input.type = "search";
+        input.className = "form-control";
+        input.placeholder = "Начните вводить Ф.И.О. или email";
+        results.className = "list-group mt-1";
+        more.type = "button";
+        more.className = "btn btn-link btn-sm";
+        more.textContent = "Показать еще";
+        more.hidden = true;
+        select.after(chosen, input, results, more);
+
+        function renderChosen() {
+            chosen.replaceChildren();
+            for (const option of select.options) {
+                const badge = document.createElement("span");
+                const remove = document.createElement("button");
+                badge.className = "badge bg-primary d-inline-flex align-items-center gap-1";
+                badge.textContent = option.textContent;
+                remove.type = "button";
+                remove.className = "btn-close btn-close-white";
+                remove.setAttribute("aria-label", "Убрать");
+                remove.addEventListener("click", () => {
+                    option.remove();
+                    renderChosen();
+                });
+                badge.append(remove);
+                chosen.append(badge);
+            }
+        }
+
+        function choose(item) {
+            const value = String(item.id);
+            if (![...select.options].some((option) => option.value === value)) {
+                select.add(new Option(item.text, value, true, true));
+                renderChosen();
+            }
+        }
+
+        function load(after) {
+            const params = new URLSearchParams({q: query});
+            const current = ++request;
+            if (after) {
+                params.set("after", after);
+            }
+            fetch(url + "?" + params)
+                .then((response) => response.json())
+                .then((data) => {
+                    if (current !== request) {
+                        return;
+                    }
+                    if (!after) {
+                        results.replaceChildren();
+                    }
+                    for (const item of data.results) {
+                        const button = document.createElement("button");
+                        button.type = "button";
+                        button.className = "list-group-item list-group-item-action";
+                        button.textContent = item.text;
+                        button.addEventListener("click", () => choose(item));
+                        results.append(button);
+                    }
+                    next = data.next;
+                    more.hidden = !next;
+                });
+        }
+
+        input.addEventListener("input", () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => {
+                query = input.value.trim();
+                load(null);
+            }, DELAY);
+        });
+        input.addEventListener("focus", () => {
+            if (!results.children.length) {
+                load(null);
+            }
+        });
+        more.addEventListener("click", () => load(next));
+        renderChosen();
+    }
+
+    document.addEventListener("DOMContentLoaded", () => {
+        document.querySelectorAll("select[data-autocomplete-url]").forEach(init);
+    });
+})();
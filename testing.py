@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def format_queries(context):
+    return "\n".join(
+        f"{number}. {query['sql']}"
+        for number, query in enumerate(context.captured_queries, start=1)
+    )
+
+
+class QueryBudgetMixin:
+    """
+    Проверки числа SQL-запросов для TestCase.
+
+    assertQueryBudget(n) - блок выполняет не больше n запросов.
+    assertConstantQueries(run, add_rows) - число запросов run() не растет
+    после добавления строк add_rows(), то есть в представлении нет N+1
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        if len(context) > budget:
+            self.fail(
+                f"Выполнено {len(context)} запросов при лимите {budget}:\n"
+                f"{format_queries(context)}"
+            )
+
+    def assertConstantQueries(self, run, add_rows, rows=5):
+        """
+        Выполняет run() до и после add_rows(rows) и сравнивает число
+        запросов. run() должен прочитать все, что выводится в шаблоне
+        """
+        with CaptureQueriesContext(connection) as before:
+            run()
+        add_rows(rows)
+        with CaptureQueriesContext(connection) as after:
+            run()
+        if len(after) != len(before):
+            self.fail(
+                f"Число запросов выросло с {len(before)} до {len(after)} "
+                f"после добавления {rows} строк:\n{format_queries(after)}"
+            )
+        return len(after)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="is_blocked",
+            field=models.BooleanField(default=False, verbose_name="Заблокирован"),
+        ),
+    ]
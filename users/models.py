@@ -1,6 +1,8 @@
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 
 class UserManager(BaseUserManager):
@@ -39,6 +41,7 @@ class User(AbstractUser):
         verbose_name="Роль",
         default=Role.USER,
     )
+    is_blocked = models.BooleanField(default=False, verbose_name="Заблокирован")
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -46,6 +49,22 @@ class User(AbstractUser):
     objects = UserManager()
 
     class Meta:
+        indexes = [
+            # Поиск в списке менеджера: icontains сравнивает UPPER(поле),
+            # триграммный индекс по тому же выражению ускоряет LIKE '%...%'
+            GinIndex(
+                OpClass(Upper("email"), name="gin_trgm_ops"), name="user_email_trgm_idx"
+            ),
+            GinIndex(
+                OpClass(Upper("first_name"), name="gin_trgm_ops"),
+                name="user_first_name_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("last_name"), name="gin_trgm_ops"),
+                name="user_last_name_trgm_idx",
+            ),
+            models.Index(fields=["date_joined"], name="user_date_joined_idx"),
+        ]
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
 
@@ -9,7 +9,7 @@ from django.urls import reverse_lazy
 from django.views.generic import CreateView, DetailView, ListView, UpdateView
 
 from mailing.models import Mailing
-from recipients.models import Recipient
+from mailing.services import get_dashboard_statistics
 from users.forms import UserProfileForm, UserRegisterForm
 from users.models import User
 
@@ -68,55 +68,16 @@ class UserMailingStatisticsView(LoginRequiredMixin, ListView):
     context_object_name = "object_list"  # важно для таблицы
 
     def get_queryset(self):
-        user = self.request.user
-
-        if user.is_authenticated and hasattr(user, "role") and user.role == "manager":
-            queryset = Mailing.objects.all()
-        elif user.is_authenticated:
-            queryset = Mailing.objects.filter(owner=user)
-        else:
-            queryset = Mailing.objects.none()
-
-        for mailing in queryset:
-            attempts = mailing.attempts.all()
-            total = attempts.count()
-            successful = attempts.filter(status="success").count()
-            failed = attempts.filter(status="failed").count()
-            success_rate = (successful / total * 100) if total > 0 else 0
-
-            mailing.stats = {
-                "total": total,
-                "successful": successful,
-                "failed": failed,
-                "success": round(success_rate, 2),
-            }
-
-        return queryset
+        self.dashboard = get_dashboard_statistics(self.request.user)
+        return self.dashboard["mailings"]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-
-        if user.is_authenticated and hasattr(user, "role") and user.role == "manager":
-            total_mailings = Mailing.objects.count()
-            active_mailings = Mailing.objects.filter(status="running").count()
-            unique_clients = Recipient.objects.distinct().count()
-        elif user.is_authenticated:
-            total_mailings = Mailing.objects.filter(owner=user).count()
-            active_mailings = Mailing.objects.filter(
-                owner=user, status="running"
-            ).count()
-            unique_clients = Recipient.objects.filter(owner=user).distinct().count()
-        else:
-            total_mailings = 0
-            active_mailings = 0
-            unique_clients = 0
-
         context.update(
             {
-                "total_mailings": total_mailings,
-                "active_mailings": active_mailings,
-                "unique_clients": unique_clients,
+                "total_mailings": self.dashboard["total_mailings"],
+                "active_mailings": self.dashboard["active_mailings"],
+                "unique_clients": self.dashboard["unique_clients"],
             }
         )
 